@@ -0,0 +1,56 @@
+"""Compare memory allocated while base64-encoding a rendered chart.
+
+The legacy path copied the PNG out of its buffer with getvalue() before encoding;
+the current path encodes from the buffer's memory directly. Run from the repo root:
+
+    python -m benchmarks.bench_encode
+"""
+import base64
+import io
+import tracemalloc
+
+import numpy as np
+
+from src.app import _encode_png_buffer, _new_figure
+
+
+def _render_png(dpi: int) -> bytes:
+    fig, ax = _new_figure()
+    rng = np.random.default_rng(0)
+    ax.scatter(rng.random(20_000), rng.random(20_000), s=2, c=rng.random(20_000))
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=dpi)
+    return buffer.getvalue()
+
+
+def _legacy_encode(buffer: io.BytesIO) -> str:
+    buffer.seek(0)
+    plot_data = buffer.getvalue()
+    buffer.close()
+    return base64.b64encode(plot_data).decode('utf-8')
+
+
+def _measure(encode, png: bytes):
+    buffer = io.BytesIO()
+    buffer.write(png)
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    encoded = encode(buffer)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return encoded, peak
+
+
+def main() -> None:
+    print(f"{'dpi':>5} {'png bytes':>12} {'legacy peak':>12} {'current peak':>13} {'saved':>7}")
+    for dpi in (100, 150, 300):
+        png = _render_png(dpi)
+        legacy, legacy_peak = _measure(_legacy_encode, png)
+        current, current_peak = _measure(_encode_png_buffer, png)
+        assert legacy == current
+        saved = 1 - current_peak / legacy_peak
+        print(f"{dpi:>5} {len(png):>12,} {legacy_peak:>12,} {current_peak:>13,} {saved:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
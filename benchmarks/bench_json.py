@@ -0,0 +1,59 @@
+"""Compare JSON ingestion paths on large line-chart payloads.
+
+Times the legacy path (stdlib json.loads followed by row-oriented DataFrame
+construction) against _parse_data, which uses orjson when it is installed and
+builds typed NumPy columns directly. Run from the repo root:
+
+    python -m benchmarks.bench_json [rows]
+"""
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import app
+
+
+def _payloads(rows: int):
+    rng = np.random.default_rng(0)
+    x = np.arange(rows)
+    y = rng.normal(size=rows).round(6)
+    records = json.dumps([{"x": int(a), "y": float(b)} for a, b in zip(x, y)])
+    columnar = json.dumps({"x": x.tolist(), "y": y.tolist()})
+    schema = json.dumps({"columns": {"x": x.tolist(), "y": y.tolist()}, "dtypes": {"x": "int64", "y": "float64"}})
+    return {"records": records, "columnar": columnar, "schema": schema}
+
+
+def _legacy_parse(text: str) -> pd.DataFrame:
+    parsed = json.loads(text)
+    if isinstance(parsed, list):
+        return pd.DataFrame(parsed)
+    # The legacy path had no schema support; the equivalent input was row records
+    parsed = parsed.get("columns", parsed) if "dtypes" in parsed else parsed
+    return pd.DataFrame.from_dict(parsed, orient='columns')
+
+
+def _best_of(fn, text: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    backend = "orjson" if app.orjson is not None else "json (stdlib)"
+    print(f"{rows:,} rows, JSON backend: {backend}")
+    print(f"{'payload':>10} {'MB':>7} {'legacy s':>9} {'current s':>10} {'speedup':>8}")
+    for name, text in _payloads(rows).items():
+        legacy = _best_of(_legacy_parse, text)
+        current = _best_of(app._parse_data, text)
+        print(f"{name:>10} {len(text) / 1e6:>7.1f} {legacy:>9.3f} {current:>10.3f} {legacy / current:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
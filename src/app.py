@@ -1,120 +1,1654 @@
 from fastmcp import FastMCP
-from mcp.types import ImageContent
+from mcp.types import ImageContent, TextContent
 import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
+import matplotlib.style
+from matplotlib.artist import setp
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import pandas as pd
 import numpy as np
-import base64
+import asyncio
+import binascii
+import hashlib
 import io
-from typing import List, Dict, Any, Optional, Union
+import multiprocessing
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Any, NamedTuple, Optional, Union
 import json
 
+try:
+    import orjson  # Optional: much faster JSON decoding for large payloads
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa  # Optional: base64 Arrow IPC and Parquet input
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
 mcp = FastMCP("Charting")
 
+# Stateless streamable HTTP: no session survives between requests, so any process or
+# instance behind a load balancer can answer any call (gunicorn's create_app always sets it)
+if os.environ.get("CHART_STATELESS_HTTP", "").lower() in ("1", "true"):
+    mcp.settings.stateless_http = True
+
 # Configure matplotlib for better appearance
-plt.style.use('default')
-plt.rcParams['figure.figsize'] = (10, 6)
-plt.rcParams['figure.dpi'] = 100
+matplotlib.style.use('default')
+matplotlib.rcParams['figure.figsize'] = (10, 6)
+matplotlib.rcParams['figure.dpi'] = 100
 
-def _create_image_content() -> ImageContent:
-    """Convert current matplotlib plot to ImageContent."""
-    buffer = io.BytesIO()
-    plt.savefig(buffer, format='png', bbox_inches='tight', dpi=150)
-    buffer.seek(0)
-    plot_data = buffer.getvalue()
+# Resolution charts are saved at, and the resulting plot width in pixels
+_SAVE_DPI = 150
+_PLOT_WIDTH_PX = int(matplotlib.rcParams['figure.figsize'][0] * _SAVE_DPI)
+
+
+class RenderRejected(ValueError):
+    """A render turned away by admission control; retry_after is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(f"{message}, retry after {retry_after:.1f} seconds")
+        self.retry_after = retry_after
+
+
+class RenderExecutor:
+    """Run blocking chart renders on a worker pool so the event loop stays responsive.
+
+    Admission control keeps latency bounded under bursts: a render is rejected straight
+    away with RenderRejected, instead of queueing, when max_queue renders are already
+    pending or when its kind (chart type) is at its limit. The retry hint is the recent
+    average time from submission to completion.
+
+    Admitted renders wait in one of two lanes and are handed to the pool only when a
+    worker is free, so the pool never queues work itself. Renders whose estimated cost
+    reaches slow_cost go to the slow lane, the rest to the fast lane. A free worker
+    always takes fast work first, and slow work never occupies the fast_workers reserved
+    workers, so small charts keep their latency while heavy ones are drawn.
+
+    Args:
+        mode: "thread" or "process" pool
+        max_workers: Number of pool workers (defaults to the CPU count)
+        max_queue: Maximum renders allowed in flight or waiting before new ones are rejected
+        recycle_after: In process mode, replace the worker pool after this many renders per
+            worker to cap matplotlib memory growth (0 disables recycling)
+        limits: Maximum renders in flight or waiting per kind, e.g. {"line": 4}
+        slow_cost: Estimated cost from which a render takes the slow lane
+        fast_workers: Workers slow renders may not use (defaults to a quarter of the
+            workers, at least one when there are two or more)
+    """
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        max_workers: Optional[int] = None,
+        max_queue: int = 64,
+        recycle_after: int = 0,
+        limits: Optional[Dict[str, int]] = None,
+        slow_cost: float = 100_000,
+        fast_workers: Optional[int] = None
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown render executor mode: {mode}")
+        if max_queue < 1:
+            raise ValueError("max_queue must be at least 1")
+        if recycle_after < 0:
+            raise ValueError("recycle_after must not be negative")
+        if limits and min(limits.values()) < 1:
+            raise ValueError("Render limits must be at least 1")
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.recycle_after = recycle_after
+        self.limits = dict(limits or {})
+        self.slow_cost = slow_cost
+        if fast_workers is None:
+            fast_workers = max(1, self.max_workers // 4) if self.max_workers > 1 else 0
+        if not 0 <= fast_workers < self.max_workers:
+            raise ValueError("fast_workers must leave at least one worker for slow renders")
+        self.fast_workers = fast_workers
+        self._pool = None
+        self._pool_renders = 0
+        self._pending = 0
+        self._pending_by_kind: Dict[str, int] = {}
+        # Admitted renders not yet handed to the pool: (fn, args, future)
+        self._fast_lane: "deque[tuple]" = deque()
+        self._slow_lane: "deque[tuple]" = deque()
+        self._running = 0
+        self._slow_running = 0
+        # Re-entrant: a pool future that is already done runs its callback immediately
+        self._lock = threading.RLock()
+        # Moving average of seconds from submission to completion, the retry hint
+        self._avg_seconds = 1.0
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of renders currently running or waiting for a worker."""
+        return self._pending
+
+    def _get_pool(self):
+        # Created lazily so forked server processes never inherit a live pool
+        if self._pool is None:
+            if self.mode == "process":
+                # forkserver/spawn: the server is multi-threaded by now, and forking it could deadlock
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(method),
+                    initializer=_warm_render_worker,
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="render")
+            self._pool_renders = 0
+        return self._pool
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        pool = self._get_pool()
+        future = pool.submit(fn, *args)
+        self._pool_renders += 1
+        if self.mode == "process" and self.recycle_after and self._pool_renders >= self.recycle_after * self.max_workers:
+            # Retire the pool: queued renders still finish, new ones go to fresh workers that
+            # start warming right away instead of on the next render
+            self._pool = None
+            pool.shutdown(wait=False)
+            self._start_workers()
+        return future
+
+    def _start_workers(self) -> List[Future]:
+        pool = self._get_pool()
+        return [pool.submit(_warm_render_worker) for _ in range(self.max_workers)]
+
+    def prewarm(self) -> None:
+        """Start every worker up front so the first renders don't pay import and font-cache costs."""
+        if self.mode == "process":
+            for future in self._start_workers():
+                future.result()
+
+    def _dispatch(self) -> None:
+        """Hand queued renders to free workers, fast lane first. Called with the lock held."""
+        while self._running < self.max_workers:
+            if self._fast_lane:
+                (fn, args, future), slow = self._fast_lane.popleft(), False
+            elif self._slow_lane and self._slow_running < self.max_workers - self.fast_workers:
+                (fn, args, future), slow = self._slow_lane.popleft(), True
+            else:
+                return
+            if not future.set_running_or_notify_cancel():
+                # Cancelled while queued; its slot was released when it was cancelled
+                continue
+            try:
+                work = self._submit(fn, *args)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            self._running += 1
+            self._slow_running += slow
+            work.add_done_callback(lambda done, future=future, slow=slow: self._finished(done, future, slow))
+
+    def _finished(self, work: Future, future: Future, slow: bool) -> None:
+        with self._lock:
+            self._running -= 1
+            self._slow_running -= slow
+            self._dispatch()
+        if work.cancelled():
+            future.set_exception(asyncio.CancelledError())
+        elif work.exception() is not None:
+            future.set_exception(work.exception())
+        else:
+            future.set_result(work.result())
+
+    def _release(self, kind: Optional[str], submitted: float) -> None:
+        with self._lock:
+            self._pending -= 1
+            if kind is not None:
+                self._pending_by_kind[kind] -= 1
+            self._avg_seconds += 0.2 * (time.monotonic() - submitted - self._avg_seconds)
+
+    def _reject(self, message: str) -> None:
+        self.rejected += 1
+        raise RenderRejected(message, retry_after=max(0.1, self._avg_seconds))
+
+    async def run(self, fn: Callable, *args, kind: Optional[str] = None, cost: float = 0) -> Any:
+        """Queue fn(*args) for the pool and await its result.
+
+        kind names the work (the chart type) for its per-kind limit, and cost (see
+        _estimate_cost) picks its lane. Raises RenderRejected when the queue or the kind's
+        limit is full.
+        """
+        future: Future = Future()
+        submitted = time.monotonic()
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._reject(f"Render queue is full ({self._pending} renders pending)")
+            limit = self.limits.get(kind)
+            if limit is not None and self._pending_by_kind.get(kind, 0) >= limit:
+                self._reject(f"Too many {kind} charts in progress ({limit} allowed at once)")
+            self._pending += 1
+            if kind is not None:
+                self._pending_by_kind[kind] = self._pending_by_kind.get(kind, 0) + 1
+            # Release the slot when the work actually finishes, or is cancelled while queued
+            future.add_done_callback(lambda _done: self._release(kind, submitted))
+            lane = self._slow_lane if cost >= self.slow_cost else self._fast_lane
+            lane.append((fn, args, future))
+            self._dispatch()
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool settings, queue depth per kind and admission control counters."""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "workers": self.max_workers,
+                "pending": self._pending,
+                "max_queue": self.max_queue,
+                "pending_by_type": {kind: n for kind, n in self._pending_by_kind.items() if n},
+                "queued": {"fast": len(self._fast_lane), "slow": len(self._slow_lane)},
+                "running": {"total": self._running, "slow": self._slow_running},
+                "slow_cost": self.slow_cost,
+                "fast_workers": self.fast_workers,
+                "limits": dict(self.limits),
+                "rejected": self.rejected,
+                "avg_render_seconds": round(self._avg_seconds, 3),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker pool; it is recreated on the next render."""
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+def _parse_limits(text: str) -> Dict[str, int]:
+    """Parse per-chart-type render limits written as "line=4,histogram=8"."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        kind, _, limit = item.partition("=")
+        try:
+            limits[kind.strip()] = int(limit)
+        except ValueError:
+            raise ValueError(f"Invalid render limit '{item}', expected <chart type>=<count>")
+    return limits
+
+
+_render_executor = RenderExecutor(
+    mode=os.environ.get("CHART_RENDER_MODE", "thread"),
+    max_workers=int(os.environ.get("CHART_RENDER_WORKERS", "0")) or None,
+    max_queue=int(os.environ.get("CHART_RENDER_MAX_QUEUE", "64")),
+    recycle_after=int(os.environ.get("CHART_RENDER_RECYCLE_AFTER", "200")),
+    limits=_parse_limits(os.environ.get("CHART_RENDER_LIMITS", "")),
+    slow_cost=float(os.environ.get("CHART_RENDER_SLOW_COST", "100000")),
+    fast_workers=int(os.environ["CHART_RENDER_FAST_WORKERS"]) if os.environ.get("CHART_RENDER_FAST_WORKERS") else None,
+)
+
+
+class RenderCache:
+    """Size-bounded LRU cache of base64-encoded charts, keyed by a hash of the tool arguments.
+
+    Args:
+        max_entries: Maximum number of charts kept (0 disables caching)
+        max_bytes: Maximum total size of the cached base64 payloads
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached payload for key, marking it most recently used."""
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return encoded
+
+    def put(self, key: str, encoded: str) -> None:
+        """Store a payload, evicting least recently used entries to stay within bounds."""
+        size = len(encoded)
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = encoded
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached chart."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache occupancy and hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_render_cache = RenderCache(
+    max_entries=int(os.environ.get("CHART_CACHE_MAX_ENTRIES", "256")),
+    max_bytes=int(os.environ.get("CHART_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+
+
+class SingleFlight:
+    """Coalesces concurrent identical renders into one, keyed by the render cache key.
+
+    The first caller for a key starts the work as a task; callers arriving while it runs
+    await the same task instead of rendering again. The task is shielded from each
+    caller, so one client disconnecting never cancels the render the others wait for.
+    Used from the event loop only.
+
+    Args:
+        enabled: Whether identical calls are coalesced at all
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Mark the error retrieved even when every caller has gone away
+            task.exception()
+
+    async def run(self, key: str, work: Callable[[], Any]) -> Any:
+        """Return the result of work(), sharing it with concurrent calls for the same key."""
+        if not self.enabled:
+            return await work()
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(work())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of renders in flight, renders started and calls that joined one."""
+        return {
+            "in_flight": len(self._in_flight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+_single_flight = SingleFlight(enabled=os.environ.get("CHART_COALESCE_RENDERS", "1") != "0")
+
+
+class DiskRenderCache:
+    """SQLite-backed chart cache shared by every server process on the instance.
+
+    Each operation opens its own connection, which keeps the cache safe to use from
+    render threads and from forked gunicorn workers alike.
+
+    Args:
+        path: SQLite database file; its directory is created if missing
+        ttl_seconds: Age after which a cached chart is treated as expired
+        max_bytes: Maximum total size of stored payloads; least recently used charts go first
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 86400, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        # Counters are bumped from several to_thread workers
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Raw PNG table from earlier versions; never read or evicted, so reclaim its space
+            conn.execute("DROP TABLE IF EXISTS charts")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS encoded_charts ("
+                "key TEXT PRIMARY KEY, data TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached payload for key unless it is missing or expired.
+
+        Database errors (a lock timeout, a full or unavailable disk) count as misses.
+        """
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT data FROM encoded_charts WHERE key = ? AND created >= ?", (key, now - self.ttl_seconds)
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE encoded_charts SET accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error:
+            self._count("errors")
+            row = None
+        if row is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return row[0]
+
+    def put(self, key: str, encoded: str) -> None:
+        """Store a payload, then drop expired and least recently used charts over the byte budget.
+
+        Database errors skip the write; the chart was rendered and is still returned.
+        """
+        if len(encoded) > self.max_bytes:
+            return
+        try:
+            self._store(key, encoded)
+        except sqlite3.Error:
+            self._count("errors")
+
+    def _store(self, key: str, encoded: str) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO encoded_charts (key, data, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, encoded, len(encoded), now, now)
+            )
+            self._count("evictions", conn.execute(
+                "DELETE FROM encoded_charts WHERE created < ?", (now - self.ttl_seconds,)
+            ).rowcount)
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM encoded_charts").fetchone()[0]
+            if total > self.max_bytes:
+                stale = []
+                for old_key, size in conn.execute("SELECT key, size FROM encoded_charts ORDER BY accessed"):
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((old_key,))
+                    total -= size
+                conn.executemany("DELETE FROM encoded_charts WHERE key = ?", stale)
+                self._count("evictions", len(stale))
+
+    def clear(self) -> None:
+        """Drop every cached chart."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM encoded_charts")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return shared occupancy plus this process's hit/miss/eviction/error counters."""
+        try:
+            with self._connect() as conn:
+                entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM encoded_charts").fetchone()
+        except sqlite3.Error:
+            entries = size = None
+        with self._lock:
+            return {
+                "path": self.path,
+                "entries": entries,
+                "bytes": size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "errors": self.errors,
+            }
+
+
+_disk_cache = (
+    DiskRenderCache(
+        os.environ["CHART_DISK_CACHE_PATH"],
+        ttl_seconds=float(os.environ.get("CHART_DISK_CACHE_TTL", "86400")),
+        max_bytes=int(os.environ.get("CHART_DISK_CACHE_MAX_BYTES", str(512 * 1024 * 1024))),
+    )
+    if os.environ.get("CHART_DISK_CACHE_PATH")
+    else None
+)
+
+
+class DatasetRegistry:
+    """Parsed datasets kept server-side so one upload can feed many charts.
+
+    Datasets are addressed by handle, expire after ttl_seconds without use, and the
+    least recently used ones are evicted to keep the frames' memory within max_bytes.
+
+    With a path, every dataset is also pickled into that directory, and handles this
+    process has not seen are loaded from it. Pointed at storage shared by every worker
+    and instance, this lets a dataset uploaded to one server be charted by any other.
+    Shared files expire after ttl_seconds without use by any of them. Directory access
+    blocks, so callers run lookups in a thread when a path is set.
+
+    Args:
+        max_entries: Maximum number of datasets kept in memory
+        max_bytes: Maximum total in-memory size of the stored DataFrames
+        ttl_seconds: Idle time after which a dataset is dropped
+        path: Optional directory shared with the other server processes
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 512 * 1024 * 1024, ttl_seconds: float = 3600,
+                 path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        # handle -> (frame, size, last used); LRU order is also last-used order
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_hits = 0
+        self.errors = 0
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            handle, (_, size, last_used) = next(iter(self._entries.items()))
+            if now - last_used < self.ttl_seconds:
+                break
+            del self._entries[handle]
+            self._bytes -= size
+            self.expirations += 1
+
+    def put(self, handle: str, df: pd.DataFrame) -> int:
+        """Store a dataset under handle and return its size in bytes."""
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_bytes:
+            raise ValueError(f"Dataset uses {size} bytes, more than the {self.max_bytes} byte limit")
+        self._remember(handle, df, size)
+        if self.path is not None:
+            self._store(handle, df)
+        return size
+
+    def _remember(self, handle: str, df: pd.DataFrame, size: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            previous = self._entries.pop(handle, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[handle] = (df, size, now)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def _file(self, handle: str) -> Optional[str]:
+        # Handles arrive from clients: only generated ones may name a file
+        if _DATASET_HANDLE.fullmatch(handle) is None:
+            return None
+        return os.path.join(self.path, handle + ".pkl")
+
+    def _store(self, handle: str, df: pd.DataFrame) -> None:
+        """Write the dataset to the shared directory and drop files idle past the TTL."""
+        target = self._file(handle)
+        if target is None:
+            return
+        # Write aside and rename, so other processes never read a partial file
+        partial = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            df.to_pickle(partial)
+            os.replace(partial, target)
+            now = time.time()
+            for entry in os.scandir(self.path):
+                if not entry.name.endswith(".pkl"):
+                    continue
+                try:
+                    if now - entry.stat().st_mtime >= self.ttl_seconds:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    # Another process pruned it first
+                    pass
+        except OSError:
+            # The dataset stays usable from this process's memory
+            with self._lock:
+                self.errors += 1
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def _load(self, handle: str) -> Optional[tuple]:
+        """Load a dataset another process stored in the shared directory."""
+        target = self._file(handle)
+        if target is None:
+            return None
+        try:
+            if time.time() - os.stat(target).st_mtime >= self.ttl_seconds:
+                return None
+            df = pd.read_pickle(target)
+            # Mark it used for every process sharing the directory
+            os.utime(target)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError):
+            with self._lock:
+                self.errors += 1
+            return None
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size <= self.max_bytes:
+            self._remember(handle, df, size)
+        with self._lock:
+            self.shared_hits += 1
+        return df, size
+
+    def lookup(self, handle: str) -> Optional[tuple]:
+        """Return (frame, size) for handle, marking it used, or None when unknown or expired."""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(handle)
+            if entry is not None:
+                self._entries[handle] = (entry[0], entry[1], now)
+                self._entries.move_to_end(handle)
+        if entry is None:
+            return self._load(handle) if self.path is not None else None
+        target = self._file(handle) if self.path is not None else None
+        if target is not None:
+            # Keep the shared copy alive while this process is the one using it
+            try:
+                os.utime(target)
+            except OSError:
+                pass
+        return entry[0], entry[1]
+
+    def get(self, handle: str) -> pd.DataFrame:
+        """Return the dataset for handle, marking it used; unknown or expired handles raise ValueError."""
+        entry = self.lookup(handle)
+        if entry is None:
+            raise ValueError(f"Unknown or expired dataset '{handle}', upload it again with upload_dataset")
+        return entry[0]
+
+    def clear(self) -> None:
+        """Drop every dataset."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return registry occupancy and eviction/expiry counters."""
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "shared_hits": self.shared_hits,
+                "errors": self.errors,
+            }
+
+
+_DATASET_HANDLE = re.compile(r"ds_[0-9a-f]{32}")
+
+_dataset_registry = DatasetRegistry(
+    max_entries=int(os.environ.get("CHART_DATASET_MAX_ENTRIES", "64")),
+    max_bytes=int(os.environ.get("CHART_DATASET_MAX_BYTES", str(512 * 1024 * 1024))),
+    ttl_seconds=float(os.environ.get("CHART_DATASET_TTL", "3600")),
+    path=os.environ.get("CHART_DATASET_PATH") or None,
+)
+
+
+async def _dataset_lookup(handle: str) -> Optional[tuple]:
+    """DatasetRegistry.lookup, run in a thread when it may read the shared directory."""
+    if _dataset_registry.path is None:
+        return _dataset_registry.lookup(handle)
+    return await asyncio.to_thread(_dataset_registry.lookup, handle)
+
+
+async def _dataset_get(handle: str) -> pd.DataFrame:
+    """DatasetRegistry.get, run in a thread when it may read the shared directory."""
+    if _dataset_registry.path is None:
+        return _dataset_registry.get(handle)
+    return await asyncio.to_thread(_dataset_registry.get, handle)
+
+
+def _dataset_handle(data: Union[str, List, Dict]) -> str:
+    """Derive a dataset handle from the raw payload, so re-uploading the same data reuses it."""
+    return "ds_" + _payload_digest(data).hexdigest()[:32]
+
+
+def _payload_digest(data: Any) -> Any:
+    """Start a sha256 digest of a data payload.
+
+    String payloads are hashed as their raw bytes; only lists and dicts are serialized
+    to canonical JSON first. Callers run this off the event loop, since payloads can be
+    tens of megabytes.
+    """
+    digest = hashlib.sha256()
+    if isinstance(data, str):
+        digest.update(b"str:")
+        digest.update(data.encode("utf-8"))
+    else:
+        digest.update(b"json:")
+        digest.update(json.dumps(data, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8"))
+    return digest
+
+def _render_cache_key(chart_type: str, params: Dict[str, Any]) -> str:
+    """Hash a chart type and its full argument set into a canonical cache key.
+
+    Tools always pass every argument, so calls relying on defaults and calls spelling
+    them out produce the same key; sorted keys make dict ordering irrelevant.
+    """
+    options = {name: value for name, value in params.items() if name != "data"}
+    digest = _payload_digest(params.get("data"))
+    digest.update(json.dumps(
+        {"chart_type": chart_type, "params": options},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    ).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ChartSpec(NamedTuple):
+    """Compact, picklable description of a render sent to executor workers."""
+    chart_type: str
+    params: Dict[str, Any]
+
+
+def _render_spec(spec: ChartSpec) -> ImageContent:
+    """Worker entry point: dispatch a chart spec to its renderer."""
+    return _CHART_RENDERERS[spec.chart_type](**spec.params)
+
+
+# Relative cost per input value: plain bars and lines draw an artist or vertex per row,
+# while histograms and grouped bars/pies reduce the data to a few shapes before drawing
+_COST_WEIGHTS = {"bar": 2.0, "line": 1.0, "histogram": 0.25, "pie": 0.25}
+_REDUCED_COST_WEIGHT = 0.25
+# Approximate payload characters per value in text and base64 formats
+_CHARS_PER_VALUE = 8
+
+def _estimate_cost(chart_type: Optional[str], params: Dict[str, Any]) -> float:
+    """Estimate a render's cost as the number of input values times a chart type weight.
+
+    Uploaded datasets arrive parsed and give rows x columns exactly. Raw payloads are
+    sized without parsing them, on the event loop: strings by length, lists and dicts
+    by their shape. Only the magnitude matters, for picking a RenderExecutor lane.
+    """
+    data = params.get("data")
+    buckets = params.get("counts") or params.get("bin_edges")
+    if buckets is not None:
+        values = len(buckets)
+    elif isinstance(data, pd.DataFrame):
+        values = len(data) * max(1, len(data.columns))
+    elif isinstance(data, str):
+        values = len(data) / _CHARS_PER_VALUE
+    elif isinstance(data, list):
+        values = len(data) * (len(data[0]) if data and isinstance(data[0], dict) else 1)
+    elif isinstance(data, dict):
+        columns = data["columns"] if _is_columnar_schema(data) else data
+        values = sum(len(v) if isinstance(v, list) else 1 for v in columns.values())
+    else:
+        values = 0
+    weight = _REDUCED_COST_WEIGHT if params.get("group_by") else _COST_WEIGHTS.get(chart_type, 1.0)
+    return values * weight
+
+
+# URI prefixes of the MCP resources that expose rendered charts and uploaded datasets
+_CHART_URI_SCHEME = "chart://"
+_DATASET_URI_SCHEME = "dataset://"
+
+
+async def _render_encoded(chart_type: str, params: Dict[str, Any], need_key: bool = False) -> tuple:
+    """Render a chart on the shared render executor, serving repeat requests from the caches.
+
+    Returns (cache key, base64 PNG). The in-memory tier is checked first; on a miss,
+    concurrent identical calls share one _render_miss. The key is None when caching and
+    coalescing are off and need_key is False.
+    """
+    if params.get("dataset") is not None and params.get("data") is not None:
+        raise ValueError("Pass either data or dataset, not both")
+    if not (need_key or _render_cache.max_entries > 0 or _disk_cache is not None or _single_flight.enabled):
+        return None, await _render_miss(chart_type, params, None)
+
+    # Hashing a large payload takes long enough to stall every other request
+    key = await asyncio.to_thread(_render_cache_key, chart_type, params)
+    encoded = _render_cache.get(key)
+    if encoded is not None:
+        return key, encoded
+    return key, await _single_flight.run(key, lambda: _render_miss(chart_type, params, key))
+
+
+async def _render_miss(chart_type: str, params: Dict[str, Any], key: Optional[str]) -> str:
+    """Produce a chart missing from the in-memory cache and return its base64 PNG.
+
+    The optional disk tier shared with the other server processes is checked first; disk
+    I/O runs in a thread to keep the event loop free. A dataset handle is part of the
+    cache key and only resolved to its DataFrame here.
+    """
+    if _disk_cache is not None:
+        encoded = await asyncio.to_thread(_disk_cache.get, key)
+        if encoded is not None:
+            _render_cache.put(key, encoded)
+            return encoded
+
+    render_params = dict(params)
+    dataset = render_params.pop("dataset", None)
+    if dataset is not None:
+        render_params["data"] = await _dataset_get(dataset)
+    image = await _render_executor.run(_render_spec, ChartSpec(chart_type, render_params), kind=chart_type,
+                                       cost=_estimate_cost(chart_type, render_params))
+    # Both tiers keep the base64 payload itself, so hits never re-encode
+    if key is not None:
+        _render_cache.put(key, image.data)
+    if _disk_cache is not None:
+        await asyncio.to_thread(_disk_cache.put, key, image.data)
+    return image.data
+
+
+async def _render_chart(chart_type: str, as_resource: bool = False, **params) -> Union[ImageContent, TextContent]:
+    """Render a chart and return it inline, or as a link to its chart:// resource."""
+    if as_resource and _render_cache.max_entries <= 0 and _disk_cache is None:
+        raise ValueError("as_resource needs the render cache, which is disabled on this server")
+    key, encoded = await _render_encoded(chart_type, params, need_key=as_resource)
+    if not as_resource:
+        return _image_content(encoded)
+    return TextContent(type="text", text=json.dumps({
+        "uri": f"{_CHART_URI_SCHEME}{key}",
+        "mimeType": "image/png",
+        "size": len(encoded) * 3 // 4,
+    }))
+
+
+def _new_figure():
+    """Create a figure and axes owned by the caller.
+
+    Figures are attached straight to an Agg canvas instead of pyplot's global figure
+    manager, so concurrent renders never share state and nothing needs closing.
+    """
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots()
+
+
+def _rotate_xticklabels(ax) -> None:
+    """Tilt x tick labels so long category names don't overlap."""
+    setp(ax.get_xticklabels(), rotation=45, ha='right')
+
+
+def _warm_render_worker() -> None:
+    """Pay matplotlib's first-draw costs (font cache, Agg canvas) once per worker process."""
+    fig, ax = _new_figure()
+    ax.plot([0, 1], [0, 1])
+    fig.savefig(io.BytesIO(), format='png')
+
+def _encode_png_buffer(buffer: io.BytesIO) -> str:
+    """Base64-encode a PNG buffer, closing it as soon as the encoded bytes exist."""
+    # Encode straight from the buffer's memory rather than copying it out with getvalue(),
+    # and free the PNG before building the final str
+    with buffer.getbuffer() as png:
+        encoded = binascii.b2a_base64(png, newline=False)
     buffer.close()
-    plt.close()  # Close the plot to free memory
-    
-    # Encode as base64 for the ImageContent data field
-    encoded = base64.b64encode(plot_data).decode('utf-8')
+    return encoded.decode('ascii')
+
+def _encode_figure(fig: Figure) -> str:
+    """Render a figure to PNG and return it base64-encoded."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=_SAVE_DPI)
+    return _encode_png_buffer(buffer)
+
+def _image_content(encoded: str) -> ImageContent:
+    """Wrap a base64 PNG payload as ImageContent."""
     return ImageContent(
         type="image", 
         data=encoded, 
         mimeType="image/png"
     )
 
-def _parse_data(data: Union[str, List, Dict]) -> pd.DataFrame:
+def _create_image_content(fig: Figure) -> ImageContent:
+    """Convert a matplotlib figure to ImageContent."""
+    return _image_content(_encode_figure(fig))
+
+_FIRST_NON_SPACE = re.compile(r'\S')
+
+# Leading base64 characters of the binary formats: an Arrow IPC stream starts with the
+# 0xFFFFFFFF continuation marker, an Arrow IPC file with "ARROW1", Parquet with "PAR1".
+# Only whole 6-bit groups are compared, as the next character also encodes following bytes
+_BINARY_PREFIXES = (("/////", "arrow"), ("QVJST1cx", "arrow"), ("UEFSM", "parquet"))
+
+def _sniff_format(text: str) -> str:
+    """Guess a string payload's format from its first non-blank character and first line.
+
+    Returns one of "json", "ndjson", "csv", "tsv", "arrow" or "parquet" without parsing
+    the payload.
+    """
+    match = _FIRST_NON_SPACE.search(text)
+    if match is None:
+        raise ValueError("Data string is empty")
+    start = match.start()
+    line_end = text.find('\n', start)
+    if line_end == -1:
+        line_end = len(text)
+
+    if match.group() == '[':
+        return "json"
+    if match.group() == '{':
+        # NDJSON: the first line is a complete object and more records follow it
+        if text[start:line_end].rstrip().endswith('}') and _FIRST_NON_SPACE.search(text, line_end):
+            return "ndjson"
+        return "json"
+    first_line = text[start:line_end]
+    if ',' not in first_line and '\t' not in first_line:
+        for prefix, binary_format in _BINARY_PREFIXES:
+            if first_line.startswith(prefix):
+                return binary_format
+    return _delimited_format(text)
+
+def _first_line(text: str) -> tuple:
+    """Return (first non-blank line, offset just past it)."""
+    start = _FIRST_NON_SPACE.search(text).start()
+    line_end = text.find('\n', start)
+    if line_end == -1:
+        line_end = len(text)
+    return text[start:line_end], line_end
+
+def _delimited_format(text: str) -> str:
+    """Choose between TSV and CSV from the first non-blank line."""
+    return "tsv" if '\t' in _first_line(text)[0] else "csv"
+
+def _looks_delimited(text: str) -> bool:
+    """Whether text has a comma or tab separated header line followed by more lines."""
+    header, line_end = _first_line(text)
+    return (',' in header or '\t' in header) and _FIRST_NON_SPACE.search(text, line_end) is not None
+
+def _json_loads(text: str) -> Any:
+    """Decode JSON with orjson when it is installed, otherwise with the stdlib."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+# Python types a JSON decoder produces for numbers and booleans
+_NUMBER_TYPES = {int, float, bool}
+
+def _column_array(values: List) -> Union[np.ndarray, List]:
+    """Convert a column of JSON values to a typed NumPy array when it is purely numeric or boolean.
+
+    Anything else (strings, nulls mixed with numbers, nested values) is returned unchanged
+    so pandas applies its usual type inference.
+    """
+    # Check element types before converting: np.asarray on strings would allocate a
+    # fixed-width array of rows x longest string, gigabytes for one long label
+    if not values or not set(map(type, values)) <= _NUMBER_TYPES:
+        return values
+    return np.asarray(values)
+
+def _frame_from_records(records: List) -> pd.DataFrame:
+    """Build a DataFrame from a list of row dicts or bare values."""
+    if records and isinstance(records[0], dict):
+        # Transpose uniform rows into one array per column instead of letting pandas
+        # walk every row dict; ragged rows fall back to pandas' general path
+        columns = list(records[0])
+        try:
+            if all(len(row) == len(columns) for row in records):
+                return pd.DataFrame({column: _column_array([row[column] for row in records]) for column in columns})
+        except (KeyError, TypeError):
+            pass
+    return pd.DataFrame(records)
+
+_SCHEMA_KEYS = {"columns", "dtypes"}
+
+def _is_columnar_schema(mapping: Dict) -> bool:
+    """Whether a mapping uses the explicit {"columns": {...}, "dtypes": {...}} input schema."""
+    return isinstance(mapping.get("columns"), dict) and set(mapping) <= _SCHEMA_KEYS
+
+def _frame_from_columnar_schema(payload: Dict) -> pd.DataFrame:
+    """Build a DataFrame from the explicit columnar schema.
+
+    Every column is converted in one call to a NumPy array of its declared dtype (or the
+    inferred one when no dtype is given), so no per-row dicts are ever created.
+    """
+    columns = payload["columns"]
+    dtypes = payload.get("dtypes") or {}
+    unknown = set(dtypes) - set(columns)
+    if unknown:
+        raise ValueError(f"dtypes given for unknown columns: {sorted(unknown)}")
+    if len({len(values) for values in columns.values()}) > 1:
+        raise ValueError("All columns must have the same length")
+
+    arrays = {}
+    for name, values in columns.items():
+        dtype = dtypes.get(name)
+        try:
+            if dtype == "category":
+                arrays[name] = pd.Categorical(values)
+            elif dtype in ("str", "string", "object"):
+                arrays[name] = np.asarray(values, dtype=object)
+            elif dtype is not None:
+                arrays[name] = np.asarray(values, dtype=np.dtype(dtype))
+            else:
+                arrays[name] = _column_array(values)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Column '{name}' could not be converted to {dtype}: {e}")
+    return pd.DataFrame(arrays, copy=False)
+
+def _frame_from_mapping(mapping: Dict) -> pd.DataFrame:
+    """Build a DataFrame from a label->value mapping or a column->values mapping."""
+    if _is_columnar_schema(mapping):
+        return _frame_from_columnar_schema(mapping)
+    if all(isinstance(v, (int, float)) for v in mapping.values()):
+        return pd.DataFrame.from_dict(mapping, orient='index')
+    if mapping and all(isinstance(v, list) for v in mapping.values()) and len({len(v) for v in mapping.values()}) == 1:
+        # Columnar fast path: each list becomes a typed array directly
+        return pd.DataFrame({column: _column_array(values) for column, values in mapping.items()})
+    return pd.DataFrame.from_dict(mapping, orient='columns')
+
+def _frame_from_json_value(parsed: Any) -> pd.DataFrame:
+    """Route a decoded JSON document to the records or mapping builder."""
+    if isinstance(parsed, list):
+        return _frame_from_records(parsed)
+    if isinstance(parsed, dict):
+        return _frame_from_mapping(parsed)
+    raise ValueError("JSON data must be an array or an object")
+
+def _parse_json_text(text: str) -> pd.DataFrame:
+    return _frame_from_json_value(_json_loads(text))
+
+def _parse_ndjson_text(text: str) -> pd.DataFrame:
+    return _frame_from_records([_json_loads(line) for line in text.splitlines() if line.strip()])
+
+def _parse_csv_text(text: str) -> pd.DataFrame:
+    return pd.read_csv(io.StringIO(text))
+
+def _parse_tsv_text(text: str) -> pd.DataFrame:
+    return pd.read_csv(io.StringIO(text), sep='\t')
+
+def _frame_from_arrow_table(table) -> pd.DataFrame:
+    """Convert an Arrow table to pandas, sharing memory with it where possible.
+
+    With split_blocks every column becomes its own block, so numeric columns without
+    nulls are wrapped as read-only NumPy views of the Arrow buffers instead of being
+    copied into consolidated 2-D blocks. Renderers never modify their input.
+    """
+    return table.to_pandas(split_blocks=True)
+
+def _decode_binary(text: str, data_format: str) -> bytes:
+    """Base64-decode a binary payload, checking that pyarrow is available to read it."""
+    if pa is None:
+        raise ValueError(f"{data_format.capitalize()} input requires pyarrow (pip install pyarrow)")
+    # a2b_base64 skips line breaks, so MIME-wrapped base64 is accepted too
+    return binascii.a2b_base64(text)
+
+def _parse_arrow_text(text: str) -> pd.DataFrame:
+    raw = _decode_binary(text, "arrow")
+    # py_buffer wraps the decoded bytes without copying them
+    buffer = pa.py_buffer(raw)
+    try:
+        if raw[:6] == b"ARROW1":
+            table = pa.ipc.open_file(buffer).read_all()
+        else:
+            table = pa.ipc.open_stream(buffer).read_all()
+    except pa.ArrowException as e:
+        raise ValueError(str(e))
+    return _frame_from_arrow_table(table)
+
+def _parse_parquet_text(text: str) -> pd.DataFrame:
+    raw = _decode_binary(text, "parquet")
+    try:
+        table = pq.read_table(pa.BufferReader(raw))
+    except pa.ArrowException as e:
+        raise ValueError(str(e))
+    return _frame_from_arrow_table(table)
+
+# Each sniffed format is parsed exactly once by its dedicated parser
+_STRING_PARSERS: Dict[str, Callable[[str], pd.DataFrame]] = {
+    "json": _parse_json_text,
+    "ndjson": _parse_ndjson_text,
+    "csv": _parse_csv_text,
+    "tsv": _parse_tsv_text,
+    "arrow": _parse_arrow_text,
+    "parquet": _parse_parquet_text,
+}
+
+def _parse_data(data: Union[str, List, Dict, pd.DataFrame]) -> pd.DataFrame:
     """Parse various data formats into a pandas DataFrame."""
+    if isinstance(data, pd.DataFrame):
+        # Registered datasets arrive already parsed; renderers never modify their input
+        return data
     if isinstance(data, str):
+        data_format = _sniff_format(data)
         try:
-            # Try to parse as JSON
-            parsed_data = json.loads(data)
-            if isinstance(parsed_data, list):
-                return pd.DataFrame(parsed_data)
-            elif isinstance(parsed_data, dict):
-                return pd.DataFrame.from_dict(parsed_data, orient='index' if all(isinstance(v, (int, float)) for v in parsed_data.values()) else 'columns')
-        except json.JSONDecodeError:
-            # Try to parse as CSV
+            return _STRING_PARSERS[data_format](data)
+        except json.JSONDecodeError as e:
+            # JSON is guessed from the first character alone, and a CSV header such as
+            # "[ms],count" starts with a bracket too: undecodable text with a delimited
+            # header line and rows below it is retried as CSV/TSV
+            if not _looks_delimited(data):
+                raise ValueError(f"Could not parse string data as {data_format.upper()}: {e}")
             try:
-                return pd.read_csv(io.StringIO(data))
-            except:
-                raise ValueError("Could not parse string data as JSON or CSV")
+                return _STRING_PARSERS[_delimited_format(data)](data)
+            except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError):
+                raise ValueError(f"Could not parse string data as {data_format.upper()}: {e}")
+        except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+            raise ValueError(f"Could not parse string data as {data_format.upper()}: {e}")
     elif isinstance(data, list):
-        return pd.DataFrame(data)
+        return _frame_from_records(data)
     elif isinstance(data, dict):
-        return pd.DataFrame.from_dict(data, orient='index' if all(isinstance(v, (int, float)) for v in data.values()) else 'columns')
+        return _frame_from_mapping(data)
     else:
-        raise ValueError("Data must be a string (JSON/CSV), list, or dictionary")
+        raise ValueError("Data must be a string (JSON/NDJSON/CSV/TSV or base64 Arrow/Parquet), list, or dictionary")
+
+# CSV/TSV strings longer than this are read in chunks of _CSV_CHUNK_ROWS rows by the
+# charts that can reduce data incrementally (grouped bars/pies, line, histogram)
+_CSV_STREAM_BYTES = int(os.environ.get("CHART_CSV_STREAM_BYTES", str(32 * 1024 * 1024)))
+_CSV_CHUNK_ROWS = int(os.environ.get("CHART_CSV_CHUNK_ROWS", "100000"))
+
+class _TextReader:
+    """Read-only file object over a string that hands out slices, unlike io.StringIO which
+    copies the whole payload up front."""
+
+    def __init__(self, text: str):
+        self._text = text
+        self._pos = 0
+
+    def read(self, size: int = -1) -> str:
+        end = len(self._text) if size is None or size < 0 else self._pos + size
+        chunk = self._text[self._pos:end]
+        self._pos += len(chunk)
+        return chunk
+
+def _is_large_delimited(data: Any) -> bool:
+    """Whether data is a CSV/TSV string big enough for chunked ingestion."""
+    return isinstance(data, str) and len(data) > _CSV_STREAM_BYTES and _sniff_format(data) in ("csv", "tsv")
+
+def _iter_csv_chunks(text: str, usecols: Optional[List] = None):
+    """Yield DataFrames of up to _CSV_CHUNK_ROWS rows from a CSV/TSV string."""
+    sep = '\t' if _delimited_format(text) == "tsv" else ','
+    try:
+        yield from pd.read_csv(_TextReader(text), sep=sep, usecols=usecols, chunksize=_CSV_CHUNK_ROWS)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        raise ValueError(f"Could not parse string data as CSV: {e}")
+
+class ColumnProfile(NamedTuple):
+    """Summary statistics of one DataFrame column."""
+    name: Any
+    dtype: Any
+    numeric: bool
+    null_count: int
+    cardinality: int
+    monotonic: bool
+
+class FrameProfile:
+    """Column statistics for one parsed payload, each computed on first use and then reused.
+
+    Renderers build one profile per DataFrame and ask it for column roles instead of
+    re-inspecting dtypes, so costlier statistics such as cardinality are only paid for
+    when a chart actually needs them, and never twice.
 
-@mcp.tool()
-async def create_bar_chart(
-    data: Union[str, List, Dict],
-    x_column: Optional[str] = None,
-    y_column: Optional[str] = None,
-    title: str = "Bar Chart",
-    x_label: str = "Categories",
-    y_label: str = "Values",
-    color: str = "steelblue",
-    horizontal: bool = False
-) -> ImageContent:
-    """Create a bar chart from the provided data.
-    
     Args:
-        data: Data in JSON string, list, or dictionary format
-        x_column: Column name for x-axis (if data is DataFrame-like)
-        y_column: Column name for y-axis (if data is DataFrame-like)
-        title: Chart title
-        x_label: X-axis label
-        y_label: Y-axis label
-        color: Bar color
-        horizontal: Whether to create horizontal bars
-        
-    Returns:
-        ImageContent with the chart as PNG image
+        df: Parsed chart data
     """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._stats: Dict[tuple, Any] = {}
+
+    def _memo(self, stat: str, column, compute: Callable[[pd.Series], Any]):
+        key = (stat, column)
+        if key not in self._stats:
+            self._stats[key] = compute(self.df[column])
+        return self._stats[key]
+
+    def is_numeric(self, column) -> bool:
+        """Whether the column holds numbers or booleans."""
+        return self._memo("numeric", column, lambda s: bool(pd.api.types.is_numeric_dtype(s)))
+
+    def is_categorical(self, column) -> bool:
+        """Whether the column should be treated as labels rather than values."""
+        return not self.is_numeric(column)
+
+    def null_count(self, column) -> int:
+        """Number of missing values in the column."""
+        return self._memo("nulls", column, lambda s: int(s.isna().sum()))
+
+    def cardinality(self, column) -> int:
+        """Number of distinct non-missing values in the column."""
+        return self._memo("cardinality", column, lambda s: int(s.nunique(dropna=True)))
+
+    def is_monotonic(self, column) -> bool:
+        """Whether the column's non-missing values never decrease."""
+        return self._memo("monotonic", column, lambda s: bool(s.dropna().is_monotonic_increasing))
+
+    def column(self, column) -> ColumnProfile:
+        """All statistics for one column."""
+        return ColumnProfile(
+            column, self.df[column].dtype, self.is_numeric(column), self.null_count(column),
+            self.cardinality(column), self.is_monotonic(column),
+        )
+
+    def numeric_columns(self, exclude=()) -> List:
+        """Names of the numeric columns, in frame order."""
+        return [c for c in self.df.columns if c not in exclude and self.is_numeric(c)]
+
+    def label_value_columns(self, label_column=None, value_column=None) -> Optional[tuple]:
+        """Pick the (label, value) column pair for a two-dimensional chart.
+
+        Explicit names win when both exist. Otherwise the first two columns are used, with
+        a categorical column preferred as the label and a numeric one as the value. Returns
+        None when the frame has fewer than two columns.
+        """
+        columns = self.df.columns
+        if label_column and value_column and label_column in columns and value_column in columns:
+            return label_column, value_column
+        if len(columns) < 2:
+            return None
+        first, second = columns[0], columns[1]
+        if self.is_categorical(second) and not self.is_categorical(first):
+            return second, first
+        return first, second
+
+def _lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices kept by Largest-Triangle-Three-Buckets downsampling of an x-sorted series.
+
+    Bucket boundaries and the bucket averages are computed in one vectorized pass; the
+    remaining loop only picks the largest-area point within each bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # The first and last points are always kept; the interior is split into n_out - 2 buckets
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    counts = ends - starts
+    interior_x, interior_y = x[1:n - 1], y[1:n - 1]
+    avg_x = np.add.reduceat(interior_x, starts - 1) / counts
+    avg_y = np.add.reduceat(interior_y, starts - 1) / counts
+    # Third triangle vertex for each bucket: the next bucket's average (or the last point)
+    next_x = np.append(avg_x[1:], x[n - 1])
+    next_y = np.append(avg_y[1:], y[n - 1])
+
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = starts[i], ends[i]
+        area = np.abs(
+            (x[a] - next_x[i]) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y[i] - y[a])
+        )
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+def _minmax_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Indices of the minimum and maximum of each of n_buckets equal index ranges.
+
+    Keeps the visual envelope of the series, so every spike survives.
+    """
+    n = len(y)
+    if n_buckets < 1 or 2 * n_buckets >= n:
+        return np.arange(n)
+
+    size = n // n_buckets
+    body = y[:size * n_buckets].reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    parts = [[0, n - 1], offsets + body.argmin(axis=1), offsets + body.argmax(axis=1)]
+    if n > size * n_buckets:
+        tail = y[size * n_buckets:]
+        parts.append(size * n_buckets + np.array([tail.argmin(), tail.argmax()]))
+    return np.unique(np.concatenate(parts))
+
+_DOWNSAMPLE_METHODS = ("lttb", "minmax", "none")
+
+def _downsample_series(x_data, y_data, method: str = "lttb", max_points: Optional[int] = None,
+                       x_sorted: Optional[bool] = None):
+    """Reduce a numeric line series to roughly one point per pixel before plotting.
+
+    Series that are short enough, have non-numeric values or an unsorted x axis are
+    returned unchanged. x_sorted passes along an already known sort order of x (for
+    example from a FrameProfile) so it is not checked again.
+    """
+    if method not in _DOWNSAMPLE_METHODS:
+        raise ValueError(f"downsample must be one of {', '.join(_DOWNSAMPLE_METHODS)}")
+    limit = max_points or _PLOT_WIDTH_PX
+    if method == "none" or len(y_data) <= limit or x_sorted is False:
+        return x_data, y_data
+
+    x_values = np.asarray(x_data)
+    y_values = np.asarray(y_data)
+    if x_values.dtype.kind not in 'biufmM' or y_values.dtype.kind not in 'biuf':
+        return x_data, y_data
+
+    # Datetimes are compared as integer nanoseconds
+    x_numeric = (x_values.view(np.int64) if x_values.dtype.kind in 'mM' else x_values).astype(np.float64)
+    y_numeric = y_values.astype(np.float64)
+    # NaT views as INT64_MIN, which isfinite accepts, so mask it explicitly
+    x_missing = np.isnat(x_values) if x_values.dtype.kind in 'mM' else ~np.isfinite(x_numeric)
+    finite = ~x_missing & np.isfinite(y_numeric)
+    if not finite.all():
+        x_values, y_values = x_values[finite], y_values[finite]
+        x_numeric, y_numeric = x_numeric[finite], y_numeric[finite]
+    if x_sorted is None and np.any(np.diff(x_numeric) < 0):
+        return x_data, y_data
+
+    if method == "lttb":
+        keep = _lttb_indices(x_numeric, y_numeric, limit)
+    else:
+        keep = _minmax_indices(y_numeric, limit // 2)
+    return x_values[keep], y_values[keep]
+
+def _downsample_csv_chunks(text: str, x_column: Optional[str], y_column: Optional[str],
+                           max_points: Optional[int] = None) -> Optional[pd.DataFrame]:
+    """Read a large CSV/TSV line series in chunks, keeping each chunk's min/max envelope.
+
+    Each chunk keeps the minimum and maximum of up to max_points buckets, so spikes
+    survive and memory is bounded by the chunk size; the line renderer then downsamples
+    the concatenated envelope as usual. Returns None for non-numeric series, so the
+    caller can fall back to a full parse.
+    """
+    limit = max_points or _PLOT_WIDTH_PX
+    roles = None
+    offset = 0
+    xs, ys = [], []
+    for chunk in _iter_csv_chunks(text):
+        if roles is None:
+            profile = FrameProfile(chunk)
+            roles = profile.label_value_columns(x_column, y_column) or (None, chunk.columns[0])
+            if not profile.is_numeric(roles[1]) or (roles[0] is not None and not profile.is_numeric(roles[0])):
+                return None
+        y = chunk[roles[1]].to_numpy(dtype=np.float64)
+        x = chunk[roles[0]].to_numpy() if roles[0] is not None else np.arange(offset, offset + len(chunk))
+        offset += len(chunk)
+        keep = _minmax_indices(y, limit)
+        xs.append(x[keep])
+        ys.append(y[keep])
+    if roles is None:
+        raise ValueError("CSV data has no rows")
+    x_name = roles[0] if roles[0] is not None else "index"
+    return pd.DataFrame({x_name: np.concatenate(xs), roles[1]: np.concatenate(ys)})
+
+# Numeric data with at most this many distinct values is drawn as one bar per value
+_DISCRETE_MAX_VALUES = 20
+# Sample size used to estimate cardinality before choosing a counting strategy
+_CARDINALITY_SAMPLE = 4096
+# Largest integer value range counted with np.bincount
+_BINCOUNT_MAX_RANGE = 1 << 16
+
+def _temporal_histogram_counts(values: pd.Series, bins: int):
+    """Bin datetime or timedelta values on their int64 view, returning edges in the original unit."""
+    if getattr(values.dtype, "tz", None) is not None:
+        values = values.dt.tz_convert(None)
+    array = values.dropna().to_numpy()
+    if len(array) == 0:
+        raise ValueError("No values available for histogram")
+    counts, edges = np.histogram(array.view(np.int64), bins=bins)
+    return None, counts, edges.round().astype(np.int64).view(array.dtype)
+
+def _histogram_counts(values: pd.Series, bins: int):
+    """Count values for a histogram in a single vectorized pass.
+
+    Returns (labels, counts, edges). Discrete data (at most 20 distinct values, or
+    non-numeric data) gets one count per value and edges is None; continuous data gets
+    np.histogram counts with their bin edges and labels is None.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values) or pd.api.types.is_timedelta64_dtype(values):
+        return _temporal_histogram_counts(values, bins)
+    if not (pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values)):
+        value_counts = values.dropna().value_counts().sort_index()
+        return value_counts.index, value_counts.to_numpy(), None
+
+    if isinstance(values.dtype, np.dtype):
+        array = values.to_numpy()
+        if array.dtype.kind == 'f':
+            array = array[~np.isnan(array)]
+    else:
+        # Nullable extension dtypes: drop missing values before leaving pandas
+        array = values.dropna().to_numpy(dtype=values.dtype.numpy_dtype)
+    if len(array) == 0:
+        raise ValueError("No numeric values available for histogram")
+
+    # Estimate cardinality on a strided sample: more than 20 distinct values there means
+    # the full data is continuous and the exact distinct count can be skipped
+    sample = array[::max(1, len(array) // _CARDINALITY_SAMPLE)]
+    if len(np.unique(sample)) <= _DISCRETE_MAX_VALUES:
+        if array.dtype.kind in 'iu' and int(array.max()) - int(array.min()) < _BINCOUNT_MAX_RANGE:
+            # Shift in int64: small dtypes such as int8 would wrap around
+            low = int(array.min())
+            counts = np.bincount(array.astype(np.int64) - low)
+            unique = np.flatnonzero(counts)
+            unique, counts = (unique + low).astype(array.dtype), counts[unique]
+        else:
+            unique, counts = np.unique(array, return_counts=True)
+        if len(unique) <= _DISCRETE_MAX_VALUES:
+            return unique, counts, None
+
+    counts, edges = np.histogram(array, bins=bins)
+    return None, counts, edges
+
+def _histogram_csv_chunks(text: str, column: Optional[str], bins: int):
+    """_histogram_counts for a large CSV/TSV string, in two passes over its chunks.
+
+    The first pass finds the value range and counts values exactly while there are at
+    most 20 distinct ones; the second pass bins continuous data. Returns None for
+    non-numeric data, or when another column holds categories (drawn as bars instead), so
+    the caller can fall back to a full parse.
+    """
+    name = None
+    low, high, total = np.inf, -np.inf, 0
+    discrete: Optional[pd.Series] = pd.Series(dtype=np.int64)
+    for chunk in _iter_csv_chunks(text):
+        if name is None:
+            if column and column in chunk.columns:
+                others = [c for c in chunk.columns if c != column]
+                if others and FrameProfile(chunk).is_categorical(others[0]):
+                    return None
+                name = column
+            else:
+                name = chunk.columns[0]
+        values = chunk[name]
+        if not pd.api.types.is_numeric_dtype(values):
+            return None
+        values = values.dropna().to_numpy()
+        if len(values) == 0:
+            continue
+        low, high, total = min(low, values.min()), max(high, values.max()), total + len(values)
+        if discrete is not None:
+            unique, counts = np.unique(values, return_counts=True)
+            discrete = discrete.add(pd.Series(counts, index=unique), fill_value=0)
+            if len(discrete) > _DISCRETE_MAX_VALUES:
+                discrete = None
+    if total == 0:
+        raise ValueError("No numeric values available for histogram")
+    if discrete is not None:
+        discrete = discrete.sort_index()
+        return discrete.index.to_numpy(), discrete.to_numpy(dtype=np.int64), None
+
+    counts = np.zeros(bins, dtype=np.int64)
+    for chunk in _iter_csv_chunks(text, usecols=[name]):
+        values = chunk[name].to_numpy(dtype=np.float64)
+        counts += np.histogram(values[~np.isnan(values)], bins=bins, range=(low, high))[0]
+    return None, counts, np.histogram_bin_edges(np.empty(0), bins=bins, range=(low, high))
+
+_AGGREGATES = ("sum", "mean", "median", "min", "max", "count")
+_OTHER_LABEL = "Other"
+
+def _check_aggregation(columns, group_by: str, aggregate: str, top_n: Optional[int]) -> None:
+    if group_by not in columns:
+        raise ValueError(f"group_by column '{group_by}' not found")
+    if aggregate not in _AGGREGATES:
+        raise ValueError(f"aggregate must be one of {', '.join(_AGGREGATES)}")
+    if top_n is not None and top_n < 1:
+        raise ValueError("top_n must be at least 1")
+
+def _aggregated_value_column(df: pd.DataFrame, group_by: str, value_column: Optional[str], aggregate: str) -> str:
+    """The column to aggregate: the requested one, else the first numeric column ("count" for counts)."""
+    if aggregate == "count":
+        return "count"
+    if value_column is None or value_column not in df.columns or value_column == group_by:
+        numeric = FrameProfile(df).numeric_columns(exclude=(group_by,))
+        if not numeric:
+            raise ValueError(f"No numeric column to {aggregate} per {group_by}")
+        value_column = numeric[0]
+    return value_column
+
+def _grouped_frame(grouped: pd.Series, group_by: str, value_column: str, top_n: Optional[int],
+                   other_of: Callable[[pd.Index], Any]):
+    """Turn per-group values into the (frame, label_column, value_column) result of an aggregation.
+
+    With top_n, only the largest top_n groups are kept; other_of receives the kept group
+    keys and returns the value of the "Other" group (None when no rows are left over).
+    """
+    # Group labels are always strings, with or without an "Other" bucket next to them
+    labels = grouped.index.astype(str)
+
+    if top_n is not None and len(grouped) > top_n:
+        # A real group called "Other" is folded into the bucket rather than shown twice
+        top = grouped[labels != _OTHER_LABEL].nlargest(top_n)
+        other = other_of(top.index)
+        if other is not None:
+            top = pd.concat([top, pd.Series([other], index=[_OTHER_LABEL])])
+        return (
+            pd.DataFrame({group_by: top.index.astype(str), value_column: top.to_numpy()}),
+            group_by,
+            value_column,
+        )
+
+    return pd.DataFrame({group_by: labels, value_column: grouped.to_numpy()}), group_by, value_column
+
+def _aggregate_frame(df: pd.DataFrame, group_by: str, value_column: Optional[str], aggregate: str = "sum",
+                     top_n: Optional[int] = None):
+    """Group raw rows before plotting so charts get one row per category.
+
+    Returns (frame, label_column, value_column). With top_n, only the largest top_n groups
+    are kept and the remaining rows are aggregated into a single "Other" group.
+    """
+    _check_aggregation(df.columns, group_by, aggregate, top_n)
+    value_column = _aggregated_value_column(df, group_by, value_column, aggregate)
+
+    keys = df[group_by]
+    if aggregate == "count":
+        grouped = keys.value_counts(sort=False).sort_index()
+    else:
+        grouped = df.groupby(group_by, sort=True)[value_column].agg(aggregate)
+
+    def other_of(kept: pd.Index):
+        # "Other" is aggregated from the raw rows so mean/median/min/max stay correct
+        rest = df[keys.notna() & ~keys.isin(kept)]
+        if not len(rest):
+            return None
+        return len(rest) if aggregate == "count" else rest[value_column].agg(aggregate)
+
+    return _grouped_frame(grouped.rename(value_column), group_by, value_column, top_n, other_of)
+
+# Aggregates that can be combined from per-chunk partial results
+_CHUNKED_AGGREGATES = ("sum", "mean", "min", "max", "count")
+
+def _finish_partials(partials: pd.DataFrame, aggregate: str) -> pd.Series:
+    if aggregate == "mean":
+        return partials["sum"] / partials["count"]
+    return partials[aggregate]
+
+def _aggregate_csv_chunks(text: str, group_by: str, value_column: Optional[str], aggregate: str = "sum",
+                          top_n: Optional[int] = None):
+    """_aggregate_frame for a large CSV/TSV string, reading it in chunks.
+
+    Each chunk is reduced to per-group sum/count/min/max partials, so memory stays bounded
+    by the chunk size and the number of groups. Returns None for aggregates that cannot be
+    combined from partials (median), leaving those to a full parse.
+    """
+    if aggregate not in _CHUNKED_AGGREGATES:
+        return None
+    partials = []
+    for chunk in _iter_csv_chunks(text):
+        if not partials:
+            _check_aggregation(chunk.columns, group_by, aggregate, top_n)
+            value_column = _aggregated_value_column(chunk, group_by, value_column, aggregate)
+        if aggregate == "count":
+            part = chunk[group_by].value_counts().rename("count").to_frame()
+        else:
+            part = chunk.groupby(group_by)[value_column].agg(["sum", "count", "min", "max"])
+        partials.append(part)
+    if not partials:
+        raise ValueError("CSV data has no rows")
+
+    combined = pd.concat(partials).groupby(level=0, sort=True).agg(
+        {column: ("sum" if column in ("sum", "count") else column) for column in partials[0].columns}
+    )
+
+    def other_of(kept: pd.Index):
+        rest = combined[~combined.index.isin(kept)]
+        if not len(rest):
+            return None
+        # The partials of the remaining groups combine exactly like their raw rows would
+        totals = rest.agg({column: ("sum" if column in ("sum", "count") else column) for column in rest.columns})
+        return _finish_partials(totals, aggregate)
+
+    grouped = _finish_partials(combined, aggregate).rename(value_column)
+    return _grouped_frame(grouped, group_by, value_column, top_n, other_of)
+
+def _load_aggregated(data, group_by: str, value_column: Optional[str], aggregate: str, top_n: Optional[int]):
+    """Parse and aggregate chart data, reading large CSV/TSV strings in chunks when possible."""
+    if _is_large_delimited(data):
+        aggregated = _aggregate_csv_chunks(data, group_by, value_column, aggregate, top_n)
+        if aggregated is not None:
+            return aggregated
+    return _aggregate_frame(_parse_data(data), group_by, value_column, aggregate, top_n)
+
+def _render_bar_chart(data, x_column, y_column, title, x_label, y_label, color, horizontal,
+                      group_by=None, aggregate="sum", top_n=None) -> ImageContent:
+    """Render a bar chart synchronously on a render executor worker."""
     try:
-        df = _parse_data(data)
+        if group_by:
+            df, x_column, y_column = _load_aggregated(data, group_by, y_column, aggregate, top_n)
+        elif top_n:
+            raise ValueError("top_n requires group_by")
+        else:
+            df = _parse_data(data)
         
-        # Smart column detection - prioritize categorical for x-axis, numerical for y-axis
-        if x_column and y_column and x_column in df.columns and y_column in df.columns:
-            x_data = df[x_column]
-            y_data = df[y_column]
-        elif len(df.columns) >= 2:
-            # Auto-detect which column should be x (categorical) and y (numerical)
-            col1, col2 = df.columns[0], df.columns[1]
-            col1_is_categorical = df[col1].dtype == 'object' or not pd.api.types.is_numeric_dtype(df[col1])
-            col2_is_categorical = df[col2].dtype == 'object' or not pd.api.types.is_numeric_dtype(df[col2])
-            
-            if col1_is_categorical and not col2_is_categorical:
-                # First column is categorical, second is numerical
-                x_data = df[col1]
-                y_data = df[col2]
-            elif col2_is_categorical and not col1_is_categorical:
-                # Second column is categorical, first is numerical
-                x_data = df[col2]
-                y_data = df[col1]
-            else:
-                # Default to original order
-                x_data = df.iloc[:, 0]
-                y_data = df.iloc[:, 1]
+        # Prefer a categorical column for the x-axis and a numerical one for the y-axis
+        profile = FrameProfile(df)
+        roles = profile.label_value_columns(x_column, y_column)
+        if roles:
+            x_data = df[roles[0]]
+            y_data = df[roles[1]]
         elif len(df.columns) == 1:
             y_data = df.iloc[:, 0]
             x_data = range(len(y_data))
         else:
             raise ValueError("Insufficient data for bar chart")
         
-        fig, ax = plt.subplots()
+        fig, ax = _new_figure()
         
         if horizontal:
             ax.barh(x_data, y_data, color=color)
@@ -129,78 +1663,95 @@ async def create_bar_chart(
             ax.set_ylabel(y_label)
             # Rotate x-axis labels if they're text and not horizontal
             if hasattr(x_data, 'dtype') and x_data.dtype == 'object':
-                plt.xticks(rotation=45, ha='right')
+                _rotate_xticklabels(ax)
         
         ax.set_title(title)
         ax.grid(True, alpha=0.3)
         
-        plt.tight_layout()
-        return _create_image_content()
+        fig.tight_layout()
+        return _create_image_content(fig)
         
     except Exception as e:
-        plt.close()
         raise ValueError(f"Error creating bar chart: {str(e)}")
 
 @mcp.tool()
-async def create_line_chart(
-    data: Union[str, List, Dict],
+async def create_bar_chart(
+    data: Optional[Union[str, List, Dict]] = None,
+    dataset: Optional[str] = None,
     x_column: Optional[str] = None,
     y_column: Optional[str] = None,
-    title: str = "Line Chart",
-    x_label: str = "X Values",
-    y_label: str = "Y Values",
-    color: str = "blue",
-    line_style: str = "-",
-    marker: str = "o"
-) -> ImageContent:
-    """Create a line chart from the provided data.
+    title: str = "Bar Chart",
+    x_label: str = "Categories",
+    y_label: str = "Values",
+    color: str = "steelblue",
+    horizontal: bool = False,
+    group_by: Optional[str] = None,
+    aggregate: str = "sum",
+    top_n: Optional[int] = None,
+    as_resource: bool = False
+) -> Union[ImageContent, TextContent]:
+    """Create a bar chart from the provided data.
     
     Args:
-        data: Data in JSON string, list, or dictionary format
+        data: Data as a JSON/NDJSON/CSV/TSV string, list, or dictionary; for large data use the
+            columnar form {"columns": {"name": [values]}, "dtypes": {"name": "float64"}}
+            or a base64 Arrow IPC / Parquet string
+        dataset: Handle returned by upload_dataset, used instead of data
         x_column: Column name for x-axis (if data is DataFrame-like)
         y_column: Column name for y-axis (if data is DataFrame-like)
         title: Chart title
         x_label: X-axis label
         y_label: Y-axis label
-        color: Line color
-        line_style: Line style ('-', '--', '-.', ':')
-        marker: Marker style ('o', 's', '^', etc.)
+        color: Bar color
+        horizontal: Whether to create horizontal bars
+        group_by: Column to group raw rows by before plotting (one bar per group)
+        aggregate: How to combine y_column per group: 'sum', 'mean', 'median', 'min', 'max' or 'count'
+        top_n: Keep only the largest N groups and collapse the rest into an "Other" bar
+        as_resource: Return a link to the chart's chart:// resource instead of the inline PNG
         
     Returns:
-        ImageContent with the chart as PNG image
+        ImageContent with the chart as PNG image, or a JSON resource link when as_resource is set
     """
+    return await _render_chart(
+        "bar",
+        as_resource=as_resource,
+        data=data,
+        dataset=dataset,
+        x_column=x_column,
+        y_column=y_column,
+        title=title,
+        x_label=x_label,
+        y_label=y_label,
+        color=color,
+        horizontal=horizontal,
+        group_by=group_by,
+        aggregate=aggregate,
+        top_n=top_n
+    )
+
+def _render_line_chart(data, x_column, y_column, title, x_label, y_label, color, line_style, marker,
+                       downsample="lttb", max_points=None) -> ImageContent:
+    """Render a line chart synchronously on a render executor worker."""
     try:
-        df = _parse_data(data)
+        df = None
+        if downsample != "none" and _is_large_delimited(data):
+            df = _downsample_csv_chunks(data, x_column, y_column, max_points)
+        if df is None:
+            df = _parse_data(data)
         
-        # Smart column detection - prioritize categorical for x-axis, numerical for y-axis
-        if x_column and y_column and x_column in df.columns and y_column in df.columns:
-            x_data = df[x_column]
-            y_data = df[y_column]
-        elif len(df.columns) >= 2:
-            # Auto-detect which column should be x (categorical) and y (numerical)
-            col1, col2 = df.columns[0], df.columns[1]
-            col1_is_categorical = df[col1].dtype == 'object' or not pd.api.types.is_numeric_dtype(df[col1])
-            col2_is_categorical = df[col2].dtype == 'object' or not pd.api.types.is_numeric_dtype(df[col2])
-            
-            if col1_is_categorical and not col2_is_categorical:
-                # First column is categorical, second is numerical
-                x_data = df[col1]
-                y_data = df[col2]
-            elif col2_is_categorical and not col1_is_categorical:
-                # Second column is categorical, first is numerical
-                x_data = df[col2]
-                y_data = df[col1]
-            else:
-                # Both are numerical or both are categorical - use original order
-                x_data = df.iloc[:, 0]
-                y_data = df.iloc[:, 1]
+        # Prefer a categorical column for the x-axis and a numerical one for the y-axis
+        profile = FrameProfile(df)
+        roles = profile.label_value_columns(x_column, y_column)
+        if roles:
+            x_data = df[roles[0]]
+            y_data = df[roles[1]]
         elif len(df.columns) == 1:
             y_data = df.iloc[:, 0]
             x_data = range(len(y_data))
         else:
             raise ValueError("Insufficient data for line chart")
         
-        fig, ax = plt.subplots()
+        fig, ax = _new_figure()
         
         # Handle categorical x-axis data
         if hasattr(x_data, 'dtype') and x_data.dtype == 'object':
@@ -210,7 +1761,9 @@ async def create_line_chart(
             ax.set_xticks(x_positions)
             ax.set_xticklabels(x_data, rotation=45, ha='right')
         else:
-            # For numerical x-axis, plot normally
+            # For numerical x-axis, plot normally after reducing huge series to the pixel width
+            x_sorted = profile.is_monotonic(roles[0]) if roles and profile.is_numeric(roles[0]) else None
+            x_data, y_data = _downsample_series(x_data, y_data, downsample, max_points, x_sorted)
             ax.plot(x_data, y_data, color=color, linestyle=line_style, marker=marker, markersize=6)
         
         ax.set_xlabel(x_label)
@@ -218,40 +1771,143 @@ async def create_line_chart(
         ax.set_title(title)
         ax.grid(True, alpha=0.3)
         
-        plt.tight_layout()
-        return _create_image_content()
+        fig.tight_layout()
+        return _create_image_content(fig)
         
     except Exception as e:
-        plt.close()
         raise ValueError(f"Error creating line chart: {str(e)}")
 
 @mcp.tool()
-async def create_histogram(
-    data: Union[str, List, Dict],
-    column: Optional[str] = None,
-    bins: int = 30,
-    title: str = "Histogram",
-    x_label: str = "Values",
-    y_label: str = "Frequency",
-    color: str = "skyblue",
-    alpha: float = 0.7
-) -> ImageContent:
-    """Create a histogram from the provided data.
+async def create_line_chart(
+    data: Optional[Union[str, List, Dict]] = None,
+    dataset: Optional[str] = None,
+    x_column: Optional[str] = None,
+    y_column: Optional[str] = None,
+    title: str = "Line Chart",
+    x_label: str = "X Values",
+    y_label: str = "Y Values",
+    color: str = "blue",
+    line_style: str = "-",
+    marker: str = "o",
+    downsample: str = "lttb",
+    max_points: Optional[int] = None,
+    as_resource: bool = False
+) -> Union[ImageContent, TextContent]:
+    """Create a line chart from the provided data.
     
     Args:
-        data: Data in JSON string, list, or dictionary format
-        column: Column name to plot (if data is DataFrame-like)
-        bins: Number of bins for the histogram
+        data: Data as a JSON/NDJSON/CSV/TSV string, list, or dictionary; for large data use the
+            columnar form {"columns": {"name": [values]}, "dtypes": {"name": "float64"}}
+            or a base64 Arrow IPC / Parquet string
+        dataset: Handle returned by upload_dataset, used instead of data
+        x_column: Column name for x-axis (if data is DataFrame-like)
+        y_column: Column name for y-axis (if data is DataFrame-like)
         title: Chart title
         x_label: X-axis label
         y_label: Y-axis label
-        color: Bar color
-        alpha: Transparency level (0-1)
+        color: Line color
+        line_style: Line style ('-', '--', '-.', ':')
+        marker: Marker style ('o', 's', '^', etc.)
+        downsample: How to thin long numeric series before plotting: 'lttb' (Largest-Triangle-
+            Three-Buckets, preserves shape), 'minmax' (min/max envelope, preserves spikes)
+            or 'none'
+        max_points: Point budget for downsampling (defaults to the plot width in pixels)
+        as_resource: Return a link to the chart's chart:// resource instead of the inline PNG
         
     Returns:
-        ImageContent with the chart as PNG image
+        ImageContent with the chart as PNG image, or a JSON resource link when as_resource is set
     """
+    return await _render_chart(
+        "line",
+        as_resource=as_resource,
+        data=data,
+        dataset=dataset,
+        x_column=x_column,
+        y_column=y_column,
+        title=title,
+        x_label=x_label,
+        y_label=y_label,
+        color=color,
+        line_style=line_style,
+        marker=marker,
+        downsample=downsample,
+        max_points=max_points
+    )
+
+def _close_open_buckets(edges: np.ndarray) -> np.ndarray:
+    """Give a -inf first or +inf last bucket edge the width of the neighbouring bucket."""
+    if len(edges) < 3:
+        return edges
+    edges = edges.copy()
+    if edges[-1] == np.inf and np.all(np.isfinite(edges[-3:-1])):
+        edges[-1] = 2 * edges[-2] - edges[-3]
+    if edges[0] == -np.inf and np.all(np.isfinite(edges[1:3])):
+        edges[0] = 2 * edges[1] - edges[2]
+    return edges
+
+def _pre_binned_counts(bin_edges: Optional[List[float]], counts: Optional[List[float]], cumulative: bool = False):
+    """Validate pre-aggregated histogram buckets and return them as arrays.
+
+    With cumulative=True, counts are running totals per upper bound (as in Prometheus
+    histogram buckets) and are converted to per-bucket counts. An infinite first or last
+    edge (Prometheus' le="+Inf" bucket) becomes an open-ended bucket drawn as wide as its
+    neighbour.
+    """
+    if bin_edges is None or counts is None:
+        raise ValueError("bin_edges and counts must be provided together")
+    edges = np.asarray(bin_edges, dtype=np.float64)
+    bucket_counts = np.asarray(counts, dtype=np.float64)
+    if edges.ndim != 1 or bucket_counts.ndim != 1 or len(bucket_counts) == 0:
+        raise ValueError("bin_edges and counts must be non-empty lists of numbers")
+    if len(edges) != len(bucket_counts) + 1:
+        raise ValueError("bin_edges must have exactly one more entry than counts")
+    edges = _close_open_buckets(edges)
+    if not np.all(np.isfinite(edges)) or np.any(np.diff(edges) <= 0):
+        raise ValueError("bin_edges must be strictly increasing and finite except for the first and last")
+    if cumulative:
+        bucket_counts = np.diff(bucket_counts, prepend=0.0)
+    if np.any(bucket_counts < 0) or not np.all(np.isfinite(bucket_counts)):
+        raise ValueError("counts must be finite and non-negative")
+    return edges, bucket_counts
+
+def _draw_histogram(labels, counts, edges, title, x_label, y_label, color, alpha) -> ImageContent:
+    """Draw histogram bars from precomputed counts.
+
+    Discrete data (edges is None) gets one labelled bar per value; binned data gets bars
+    spanning each pair of edges.
+    """
+    fig, ax = _new_figure()
+    if edges is None:
+        # For discrete/categorical data, create a bar chart of value counts
+        ax.bar(range(len(counts)), counts, color=color, alpha=alpha)
+        ax.set_xticks(range(len(counts)))
+        ax.set_xticklabels(labels, rotation=45, ha='right')
+    else:
+        # True histogram for continuous data
+        ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+               color=color, alpha=alpha, edgecolor='black', linewidth=0.5)
+    ax.set_xlabel(x_label)
+    ax.set_ylabel(y_label)
+    ax.set_title(title)
+    ax.grid(True, alpha=0.3)
+    
+    fig.tight_layout()
+    return _create_image_content(fig)
+
+def _render_histogram(data, column, bins, title, x_label, y_label, color, alpha,
+                      bin_edges=None, counts=None, cumulative_counts=False) -> ImageContent:
+    """Render a histogram synchronously on a render executor worker."""
     try:
+        if bin_edges is not None or counts is not None:
+            # Pre-aggregated buckets are drawn directly, no raw samples involved
+            edges, bucket_counts = _pre_binned_counts(bin_edges, counts, cumulative_counts)
+            return _draw_histogram(None, bucket_counts, edges, title, x_label, y_label, color, alpha)
+
+        if _is_large_delimited(data):
+            binned = _histogram_csv_chunks(data, column, bins)
+            if binned is not None:
+                return _draw_histogram(*binned, title, x_label, y_label, color, alpha)
+
         df = _parse_data(data)
         
         # Check if this is categorical data that should be a bar chart instead
@@ -264,21 +1920,21 @@ async def create_histogram(
                 if other_columns:
                     categories_col = other_columns[0]
                     values_col = column
-                    
+                
                     # Check if the categories column contains text/categorical data
-                    if df[categories_col].dtype == 'object' or not pd.api.types.is_numeric_dtype(df[categories_col]):
+                    if FrameProfile(df).is_categorical(categories_col):
                         # This is categorical data - create a bar chart instead
-                        fig, ax = plt.subplots()
+                        fig, ax = _new_figure()
                         ax.bar(df[categories_col], df[values_col], color=color, alpha=alpha)
                         ax.set_xlabel(x_label)
                         ax.set_ylabel(y_label)
                         ax.set_title(title)
                         ax.grid(True, alpha=0.3)
-                        
+                    
                         # Rotate x-axis labels for better readability
-                        plt.xticks(rotation=45, ha='right')
-                        plt.tight_layout()
-                        return _create_image_content()
+                        _rotate_xticklabels(ax)
+                        fig.tight_layout()
+                        return _create_image_content(fig)
         
         # Original histogram logic for continuous numerical data
         # Select data to plot
@@ -289,110 +1945,144 @@ async def create_histogram(
         else:
             raise ValueError("No data available for histogram")
         
-        # Remove NaN values
-        plot_data = plot_data.dropna()
-        
-        # Check if data is actually categorical/discrete
-        if plot_data.dtype == 'object' or len(plot_data.unique()) <= 20:
-            # For discrete/categorical data, create a bar chart of value counts
-            value_counts = plot_data.value_counts().sort_index()
-            fig, ax = plt.subplots()
-            ax.bar(range(len(value_counts)), value_counts.values, color=color, alpha=alpha)
-            ax.set_xticks(range(len(value_counts)))
-            ax.set_xticklabels(value_counts.index, rotation=45, ha='right')
-            ax.set_xlabel(x_label)
-            ax.set_ylabel(y_label)
-            ax.set_title(title)
-            ax.grid(True, alpha=0.3)
-        else:
-            # True histogram for continuous data
-            fig, ax = plt.subplots()
-            ax.hist(plot_data, bins=bins, color=color, alpha=alpha, edgecolor='black', linewidth=0.5)
-            ax.set_xlabel(x_label)
-            ax.set_ylabel(y_label)
-            ax.set_title(title)
-            ax.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
-        return _create_image_content()
+        # Count once, then draw bars straight from the counts
+        labels, value_counts, edges = _histogram_counts(plot_data, bins)
+        return _draw_histogram(labels, value_counts, edges, title, x_label, y_label, color, alpha)
         
     except Exception as e:
-        plt.close()
         raise ValueError(f"Error creating histogram: {str(e)}")
 
 @mcp.tool()
-async def create_pie_chart(
-    data: Union[str, List, Dict],
-    labels_column: Optional[str] = None,
-    values_column: Optional[str] = None,
-    title: str = "Pie Chart",
-    colors: Optional[List[str]] = None,
-    autopct: str = "%1.1f%%",
-    startangle: int = 90
-) -> ImageContent:
-    """Create a pie chart from the provided data.
+async def create_histogram(
+    data: Optional[Union[str, List, Dict]] = None,
+    dataset: Optional[str] = None,
+    column: Optional[str] = None,
+    bins: int = 30,
+    title: str = "Histogram",
+    x_label: str = "Values",
+    y_label: str = "Frequency",
+    color: str = "skyblue",
+    alpha: float = 0.7,
+    bin_edges: Optional[List[float]] = None,
+    counts: Optional[List[float]] = None,
+    cumulative_counts: bool = False,
+    as_resource: bool = False
+) -> Union[ImageContent, TextContent]:
+    """Create a histogram from raw values or from pre-aggregated bucket counts.
     
     Args:
-        data: Data in JSON string, list, or dictionary format
-        labels_column: Column name for labels (if data is DataFrame-like)
-        values_column: Column name for values (if data is DataFrame-like)
+        data: Data as a JSON/NDJSON/CSV/TSV string, list, or dictionary; for large data use the
+            columnar form {"columns": {"name": [values]}, "dtypes": {"name": "float64"}}
+            or a base64 Arrow IPC / Parquet string.
+            Not needed when bin_edges and counts are given
+        dataset: Handle returned by upload_dataset, used instead of data
+        column: Column name to plot (if data is DataFrame-like)
+        bins: Number of bins for the histogram
         title: Chart title
-        colors: List of colors for pie slices
-        autopct: Format string for percentages
-        startangle: Starting angle for the pie chart
+        x_label: X-axis label
+        y_label: Y-axis label
+        color: Bar color
+        alpha: Transparency level (0-1)
+        bin_edges: Pre-aggregated bucket boundaries (one more entry than counts), e.g. from a
+            database GROUP BY or a Prometheus histogram
+        counts: Count per bucket, used together with bin_edges
+        cumulative_counts: Whether counts are running totals per upper bound (Prometheus style)
+        as_resource: Return a link to the chart's chart:// resource instead of the inline PNG
         
     Returns:
-        ImageContent with the chart as PNG image
+        ImageContent with the chart as PNG image, or a JSON resource link when as_resource is set
+    """
+    if bin_edges is not None or counts is not None:
+        # Buckets are drawn as given, so a dataset handle is neither needed nor resolved
+        dataset = None
+    return await _render_chart(
+        "histogram",
+        as_resource=as_resource,
+        data=data,
+        dataset=dataset,
+        column=column,
+        bins=bins,
+        title=title,
+        x_label=x_label,
+        y_label=y_label,
+        color=color,
+        alpha=alpha,
+        bin_edges=bin_edges,
+        counts=counts,
+        cumulative_counts=cumulative_counts
+    )
+
+def _positive_slices(labels, values):
+    """Drop zero, negative and missing values from pie inputs with a single boolean mask.
+
+    Returns (labels, values) as NumPy arrays. When labels is None, "Category i" labels are
+    built only for the slices that survive the filter, numbered by their original position.
+    """
+    if isinstance(values, pd.Series):
+        values = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        values = np.asarray(values, dtype=np.float64)
+    mask = values > 0
+    if labels is None:
+        labels = np.array([f"Category {i}" for i in np.flatnonzero(mask) + 1], dtype=object)
+    else:
+        labels = np.asarray(labels, dtype=object)[mask]
+    return labels, values[mask]
+
+def _collapse_small_slices(labels, values, max_slices: int):
+    """Keep the largest max_slices - 1 slices in their original order and merge the rest into "Other".
+
+    Expects the NumPy arrays returned by _positive_slices.
+
+    The largest slices are found with np.argpartition, an O(n) partial sort, so pies built
+    from thousands of rows only ever draw max_slices wedges. An existing "Other" slice (for
+    example from top_n grouping) is never kept on its own but merged into the new one.
     """
+    if max_slices < 2:
+        raise ValueError("max_slices must be at least 2")
+    if len(values) <= max_slices:
+        return labels, values
+    keep = max_slices - 1
+    candidates = np.flatnonzero(labels != _OTHER_LABEL)
+    if len(candidates) > keep:
+        candidates = candidates[np.argpartition(values[candidates], -keep)[-keep:]]
+    top = np.sort(candidates)
+    other = values.sum() - values[top].sum()
+    return np.append(labels[top], _OTHER_LABEL), np.append(values[top], other)
+
+def _render_pie_chart(data, labels_column, values_column, title, colors, autopct, startangle,
+                      group_by=None, aggregate="sum", top_n=None, max_slices=None) -> ImageContent:
+    """Render a pie chart synchronously on a render executor worker."""
     try:
-        df = _parse_data(data)
+        if group_by:
+            df, labels_column, values_column = _load_aggregated(data, group_by, values_column, aggregate, top_n)
+        elif top_n:
+            raise ValueError("top_n requires group_by")
+        else:
+            df = _parse_data(data)
         
-        # Smart column detection - prioritize categorical for labels, numerical for values
-        if labels_column and values_column and labels_column in df.columns and values_column in df.columns:
-            labels = df[labels_column]
-            values = df[values_column]
-        elif len(df.columns) >= 2:
-            # Auto-detect which column should be labels (categorical) and values (numerical)
-            col1, col2 = df.columns[0], df.columns[1]
-            col1_is_categorical = df[col1].dtype == 'object' or not pd.api.types.is_numeric_dtype(df[col1])
-            col2_is_categorical = df[col2].dtype == 'object' or not pd.api.types.is_numeric_dtype(df[col2])
-            
-            if col1_is_categorical and not col2_is_categorical:
-                # First column is categorical (labels), second is numerical (values)
-                labels = df[col1]
-                values = df[col2]
-            elif col2_is_categorical and not col1_is_categorical:
-                # Second column is categorical (labels), first is numerical (values)
-                labels = df[col2]
-                values = df[col1]
-            else:
-                # Default to original order
-                labels = df.iloc[:, 0]
-                values = df.iloc[:, 1]
+        # Prefer a categorical column for labels and a numerical one for values
+        profile = FrameProfile(df)
+        roles = profile.label_value_columns(labels_column, values_column)
+        if roles:
+            labels = df[roles[0]]
+            values = df[roles[1]]
         elif len(df.columns) == 1 and df.index.name:
             labels = df.index
             values = df.iloc[:, 0]
         else:
-            # If only values are provided, create generic labels
-            values = df.iloc[:, 0] if len(df.columns) >= 1 else df.iloc[:, 0]
-            labels = [f"Category {i+1}" for i in range(len(values))]
+            # If only values are provided, generic labels are created after filtering
+            values = df.iloc[:, 0]
+            labels = None
         
-        # Remove zero or negative values
-        mask = values > 0
-        if isinstance(labels, pd.Series):
-            labels = labels[mask]
-        else:
-            # For list-like labels, filter based on mask
-            if hasattr(mask, 'iloc'):
-                labels = [labels[i] for i in range(len(labels)) if mask.iloc[i]]
-            else:
-                labels = [labels[i] for i in range(len(labels)) if mask[i]]
-        values = values[mask]
+        labels, values = _positive_slices(labels, values)
         
         if len(values) == 0:
             raise ValueError("No positive values found for pie chart")
+        if max_slices is not None:
+            labels, values = _collapse_small_slices(labels, values, max_slices)
         
-        fig, ax = plt.subplots()
+        fig, ax = _new_figure()
         wedges, texts, autotexts = ax.pie(
             values, 
             labels=labels, 
@@ -404,13 +2094,160 @@ async def create_pie_chart(
         
         ax.set_title(title)
         
-        plt.tight_layout()
-        return _create_image_content()
+        fig.tight_layout()
+        return _create_image_content(fig)
         
     except Exception as e:
-        plt.close()
         raise ValueError(f"Error creating pie chart: {str(e)}")
 
+@mcp.tool()
+async def create_pie_chart(
+    data: Optional[Union[str, List, Dict]] = None,
+    dataset: Optional[str] = None,
+    labels_column: Optional[str] = None,
+    values_column: Optional[str] = None,
+    title: str = "Pie Chart",
+    colors: Optional[List[str]] = None,
+    autopct: str = "%1.1f%%",
+    startangle: int = 90,
+    group_by: Optional[str] = None,
+    aggregate: str = "sum",
+    top_n: Optional[int] = None,
+    max_slices: Optional[int] = None,
+    as_resource: bool = False
+) -> Union[ImageContent, TextContent]:
+    """Create a pie chart from the provided data.
+    
+    Args:
+        data: Data as a JSON/NDJSON/CSV/TSV string, list, or dictionary; for large data use the
+            columnar form {"columns": {"name": [values]}, "dtypes": {"name": "float64"}}
+            or a base64 Arrow IPC / Parquet string
+        dataset: Handle returned by upload_dataset, used instead of data
+        labels_column: Column name for labels (if data is DataFrame-like)
+        values_column: Column name for values (if data is DataFrame-like)
+        title: Chart title
+        colors: List of colors for pie slices
+        autopct: Format string for percentages
+        startangle: Starting angle for the pie chart
+        group_by: Column to group raw rows by before plotting (one slice per group)
+        aggregate: How to combine values_column per group: 'sum', 'mean', 'median', 'min', 'max' or 'count'
+        top_n: Keep only the largest N groups and collapse the rest into an "Other" slice
+        max_slices: Maximum wedges to draw; the smallest slices are merged into one "Other" wedge
+        as_resource: Return a link to the chart's chart:// resource instead of the inline PNG
+        
+    Returns:
+        ImageContent with the chart as PNG image, or a JSON resource link when as_resource is set
+    """
+    return await _render_chart(
+        "pie",
+        as_resource=as_resource,
+        data=data,
+        dataset=dataset,
+        labels_column=labels_column,
+        values_column=values_column,
+        title=title,
+        colors=colors,
+        autopct=autopct,
+        startangle=startangle,
+        group_by=group_by,
+        aggregate=aggregate,
+        top_n=top_n,
+        max_slices=max_slices
+    )
+
+@mcp.tool()
+async def upload_dataset(data: Union[str, List, Dict]) -> Dict[str, Any]:
+    """Parse a dataset once and keep it on the server for repeated charting.
+    
+    Pass the returned handle as the dataset argument of any create_* tool instead of
+    re-sending the data. Unused datasets expire and the least recently used are evicted
+    when server memory for datasets runs out; upload again if a handle stops working.
+    
+    Args:
+        data: Data as a JSON/NDJSON/CSV/TSV string, list, or dictionary; for large data use the
+            columnar form {"columns": {"name": [values]}, "dtypes": {"name": "float64"}}
+            or a base64 Arrow IPC / Parquet string
+        
+    Returns:
+        Dictionary with the dataset handle and its dataset:// resource URI, row count, column
+        names and dtypes, and size in bytes
+    """
+    # Hashing, parsing and sizing a large payload all stay off the event loop
+    handle = await asyncio.to_thread(_dataset_handle, data)
+    entry = await _dataset_lookup(handle)
+    if entry is not None:
+        # Identical data is already registered: reuse it instead of parsing again
+        df, size = entry
+    else:
+        df = await _render_executor.run(_parse_data, data, cost=_estimate_cost(None, {"data": data}))
+        size = await asyncio.to_thread(_dataset_registry.put, handle, df)
+    return {
+        "dataset": handle,
+        "uri": f"{_DATASET_URI_SCHEME}{handle}",
+        "rows": len(df),
+        "columns": [str(c) for c in df.columns],
+        "dtypes": {str(c): str(t) for c, t in df.dtypes.items()},
+        "bytes": size,
+        "ttl_seconds": _dataset_registry.ttl_seconds,
+    }
+
+@mcp.tool()
+async def get_render_stats() -> Dict[str, Any]:
+    """Report render executor load, render cache and dataset registry statistics.
+    
+    Returns:
+        Dictionary with executor settings, queue depth per chart type and rejections, cache hit,
+        miss and eviction counts, coalesced render counts, and dataset registry occupancy
+    """
+    return {
+        "executor": _render_executor.stats(),
+        "cache": _render_cache.stats(),
+        "coalescing": _single_flight.stats(),
+        "disk_cache": _disk_cache.stats() if _disk_cache is not None else None,
+        "datasets": _dataset_registry.stats(),
+    }
+
+@mcp.resource(_CHART_URI_SCHEME + "{key}", mime_type="image/png")
+async def chart_resource(key: str) -> bytes:
+    """A rendered chart, as linked by create_* tools called with as_resource.
+
+    Served from the render caches; charts that have been evicted must be rendered again.
+    """
+    encoded = _render_cache.get(key)
+    if encoded is None and _disk_cache is not None:
+        encoded = await asyncio.to_thread(_disk_cache.get, key)
+    if encoded is None:
+        raise ValueError(f"Chart '{key}' is no longer cached, render it again")
+    return binascii.a2b_base64(encoded)
+
+@mcp.resource(_DATASET_URI_SCHEME + "{handle}", mime_type="text/csv")
+async def dataset_resource(handle: str) -> str:
+    """An uploaded dataset as CSV."""
+    df = await _dataset_get(handle)
+    return await asyncio.to_thread(df.to_csv, index=False)
+
+_CHART_RENDERERS: Dict[str, Callable[..., ImageContent]] = {
+    "bar": _render_bar_chart,
+    "line": _render_line_chart,
+    "histogram": _render_histogram,
+    "pie": _render_pie_chart,
+}
+
+def create_app():
+    """ASGI application factory, served by gunicorn as ``app:create_app()`` (see gunicorn.conf.py).
+
+    Gunicorn calls it once in every worker process after forking, so each worker warms
+    matplotlib and starts its render pool before taking requests. Streamable-HTTP sessions
+    live in the memory of the worker that created them, and gunicorn hands every connection
+    to whichever worker accepts it, so the app runs stateless: each request gets a fresh
+    transport and no call depends on an earlier one reaching the same worker.
+    """
+    _warm_render_worker()
+    _render_executor.prewarm()
+    mcp.settings.stateless_http = True
+    return mcp.http_app(transport="streamable-http")
+
 if __name__ == "__main__":
+    _render_executor.prewarm()
     mcp.run(transport="streamable-http", port=8001)
 
@@ -0,0 +1,24 @@
+"""Gunicorn settings for serving the chart server on every core of an instance.
+
+Run from the src directory:  gunicorn "app:create_app()"
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# One uvicorn worker per core; each runs its own event loop and render pool
+workers = int(os.environ.get("CHART_WEB_WORKERS", "0")) or multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# The app is created after forking, so every worker imports and warms matplotlib itself
+# rather than inheriting a half-initialised font cache and thread pool from the master
+preload_app = False
+
+# Large charts can take a while; keep in line with the App Service request timeout
+timeout = int(os.environ.get("CHART_WEB_TIMEOUT", "230"))
+graceful_timeout = 30
+keepalive = 75
+
+accesslog = "-"
+errorlog = "-"
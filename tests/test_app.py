@@ -1,9 +1,24 @@
 import pytest
+import asyncio
 import json
+import logging
+import os
+import threading
+import time
 import base64
+import httpx
+from contextlib import AsyncExitStack
 from fastmcp import FastMCP, Client
 from mcp.types import ImageContent
-from src.app import mcp
+import src.app as app_module
+from src.app import (
+    mcp, ChartSpec, DatasetRegistry, DiskRenderCache, FrameProfile, RenderCache, RenderExecutor, RenderRejected,
+    SingleFlight,
+    _aggregate_csv_chunks, _aggregate_frame, _collapse_small_slices, _downsample_series, _encode_png_buffer, _histogram_counts,
+    _histogram_csv_chunks, _downsample_csv_chunks, _lttb_indices, _minmax_indices, _parse_data, _positive_slices, _pre_binned_counts, _render_spec,
+    _estimate_cost, _parse_limits, _sniff_format,
+)
+import numpy as np
 import pandas as pd
 import io
 from PIL import Image
@@ -153,6 +168,64 @@ class TestLineChart:
             validate_image_content(result)
 
 
+class TestLineChartDownsampling:
+    def test_lttb_keeps_endpoints_and_spikes(self):
+        """Test that LTTB returns the requested point count and keeps outliers"""
+        x = np.arange(100_000, dtype=float)
+        y = np.sin(x / 1000)
+        y[54_321] = 50.0
+        keep = _lttb_indices(x, y, 500)
+
+        assert len(keep) == 500
+        assert keep[0] == 0 and keep[-1] == len(x) - 1
+        assert np.all(np.diff(keep) > 0)
+        assert 54_321 in keep
+
+    def test_minmax_keeps_global_extremes(self):
+        """Test that the min/max envelope keeps every bucket's extremes"""
+        y = np.random.default_rng(0).normal(size=100_003)
+        keep = _minmax_indices(y, 250)
+
+        assert len(keep) <= 2 * 251 + 2
+        assert y.argmin() in keep and y.argmax() in keep
+        assert keep[0] == 0 and keep[-1] == len(y) - 1
+
+    @pytest.mark.parametrize("method", ["lttb", "minmax", "none"])
+    async def test_large_line_chart(self, mcp_server, method):
+        """Test line charts of long series with each downsampling mode"""
+        y = np.cumsum(np.random.default_rng(1).normal(size=50_000)).round(3)
+        payload = {"columns": {"t": list(range(len(y))), "v": y.tolist()}}
+        async with Client(mcp_server) as client:
+            result = await client.call_tool("create_line_chart", {
+                "data": payload,
+                "x_column": "t",
+                "y_column": "v",
+                "marker": "",
+                "downsample": method
+            })
+            
+            validate_image_content(result)
+
+    def test_datetime_axis_with_missing_value(self):
+        """Test that a single NaT does not switch off downsampling of a datetime series"""
+        x = pd.Series(pd.date_range("2024-01-01", periods=5000, freq="min"))
+        x[10] = pd.NaT
+        y = pd.Series(np.sin(np.arange(5000) / 50.0))
+        x_out, y_out = _downsample_series(x, y, "lttb", 500)
+
+        assert len(x_out) == 500
+        assert not np.isnat(x_out).any()
+
+    async def test_invalid_downsample_method(self, mcp_server, sample_data):
+        """Test that unknown downsampling modes are rejected"""
+        async with Client(mcp_server) as client:
+            with pytest.raises(Exception):
+                await client.call_tool("create_line_chart", {
+                    "data": list(range(5000)),
+                    "downsample": "median"
+                })
+
+
 class TestHistogram:
     async def test_histogram_with_numeric_list(self, mcp_server, sample_data):
         """Test histogram creation with numeric list"""
@@ -194,6 +267,125 @@ class TestHistogram:
             validate_image_content(result)
 
 
+class TestHistogramBinning:
+    def test_discrete_integers_counted_per_value(self):
+        """Test that low-cardinality integers get one count per value"""
+        values = pd.Series(np.random.default_rng(0).integers(-3, 5, size=100_000))
+        labels, counts, edges = _histogram_counts(values, bins=30)
+
+        expected = values.value_counts().sort_index()
+        assert edges is None
+        assert list(labels) == list(expected.index)
+        assert list(counts) == list(expected.values)
+
+    def test_continuous_values_use_bin_edges(self):
+        """Test that high-cardinality data is binned with the requested number of bins"""
+        values = pd.Series(np.random.default_rng(0).normal(size=100_000))
+        values[::10] = np.nan
+        labels, counts, edges = _histogram_counts(values, bins=25)
+
+        assert labels is None
+        assert len(edges) == 26
+        assert counts.sum() == values.notna().sum()
+
+    def test_wide_range_discrete_integers(self):
+        """Test that few distinct but widely spread integers stay discrete"""
+        labels, counts, edges = _histogram_counts(pd.Series([0, 1_000_000, 0, 5_000_000]), bins=10)
+
+        assert edges is None
+        assert list(labels) == [0, 1_000_000, 5_000_000]
+        assert list(counts) == [2, 1, 1]
+
+    def test_text_and_nullable_values(self):
+        """Test that text is counted by value and nullable integers drop missing values"""
+        labels, counts, _ = _histogram_counts(pd.Series(["b", "a", "b", None]), bins=10)
+        assert list(labels) == ["a", "b"] and list(counts) == [1, 2]
+
+        labels, counts, _ = _histogram_counts(pd.Series([1, None, 1, 2], dtype="Int64"), bins=10)
+        assert list(labels) == [1, 2] and list(counts) == [2, 1]
+
+
+    def test_small_integer_dtypes_do_not_wrap(self):
+        """Test that int8 values spanning most of their range are counted correctly"""
+        labels, counts, edges = _histogram_counts(pd.Series([-100, 100, 5], dtype=np.int8), bins=10)
+
+        assert edges is None
+        assert list(labels) == [-100, 5, 100] and list(counts) == [1, 1, 1]
+
+    async def test_datetime_values_are_binned(self, mcp_server):
+        """Test that timestamps are binned into bins rather than counted one bar each"""
+        times = pd.Series(pd.date_range("2024-01-01", periods=5000, freq="h"))
+        labels, counts, edges = _histogram_counts(times, bins=30)
+
+        assert labels is None
+        assert len(edges) == 31 and edges.dtype == times.dtype
+        assert counts.sum() == 5000
+
+        async with Client(mcp_server) as client:
+            result = await client.call_tool("create_histogram", {
+                "data": {"columns": {"t": times.astype(str).tolist()}, "dtypes": {"t": "datetime64[ns]"}},
+                "bins": 20
+            })
+            validate_image_content(result)
+
+class TestPreBinnedHistogram:
+    async def test_histogram_from_bucket_counts(self, mcp_server):
+        """Test drawing a histogram from bin edges and counts without raw data"""
+        async with Client(mcp_server) as client:
+            result = await client.call_tool("create_histogram", {
+                "bin_edges": [0, 10, 20, 50, 100],
+                "counts": [5, 12, 30, 8],
+                "title": "Latency Buckets"
+            })
+            
+            validate_image_content(result)
+
+    async def test_histogram_from_cumulative_counts(self, mcp_server):
+        """Test Prometheus-style cumulative bucket counts"""
+        async with Client(mcp_server) as client:
+            result = await client.call_tool("create_histogram", {
+                "bin_edges": [0, 0.1, 0.5, 1.0],
+                "counts": [3, 10, 12],
+                "cumulative_counts": True
+            })
+            
+            validate_image_content(result)
+
+    def test_cumulative_counts_are_differenced(self):
+        """Test conversion of running totals to per-bucket counts"""
+        edges, counts = _pre_binned_counts([0, 1, 2, 3], [3, 10, 12], cumulative=True)
+        assert list(edges) == [0, 1, 2, 3]
+        assert list(counts) == [3, 7, 2]
+
+    async def test_open_ended_prometheus_bucket(self, mcp_server):
+        """Test that a final +Inf edge is drawn as an open-ended bucket"""
+        edges, counts = _pre_binned_counts([0, 0.1, 0.5, float("inf")], [3, 10, 12], cumulative=True)
+        assert list(edges) == [0, 0.1, 0.5, 0.9]
+        assert list(counts) == [3, 7, 2]
+
+        async with Client(mcp_server) as client:
+            result = await client.call_tool("create_histogram", {
+                "bin_edges": [0, 0.1, 0.5, "inf"],
+                "counts": [3, 10, 12],
+                "cumulative_counts": True,
+                "dataset": "ds_never_uploaded"
+            })
+            validate_image_content(result)
+
+    @pytest.mark.parametrize("edges, counts", [
+        ([0, 1, 2], [1, 2, 3]),
+        ([0, 2, 1], [1, 2]),
+        ([0, float("inf"), 2], [1, 2]),
+        ([0, float("inf")], [1]),
+        ([0, 1, 2], [1, -2]),
+        ([0, 1], None),
+    ])
+    def test_invalid_buckets_rejected(self, edges, counts):
+        """Test validation of pre-aggregated buckets"""
+        with pytest.raises(ValueError):
+            _pre_binned_counts(edges, counts)
+
+
 class TestPieChart:
     async def test_pie_chart_with_dict(self, mcp_server, sample_data):
         """Test pie chart creation with dictionary data"""
@@ -234,6 +426,116 @@ class TestPieChart:
             validate_image_content(result)
 
 
+class TestPieSliceCollapse:
+    def test_collapse_keeps_largest_in_order(self):
+        """Test that the largest slices keep their order and the tail sums into Other"""
+        labels, values = _collapse_small_slices(
+            np.array(["a", "b", "c", "d", "e"], dtype=object), np.array([5.0, 40.0, 1.0, 30.0, 2.0]), 3
+        )
+        assert list(labels) == ["b", "d", "Other"]
+        assert list(values) == [40, 30, 8]
+
+    def test_existing_other_slice_is_merged(self):
+        """Test that top_n's Other slice and max_slices never yield two Other wedges"""
+        grouped, label_col, value_col = _aggregate_frame(
+            pd.DataFrame({"k": list("abcdefghij"), "v": np.arange(1.0, 11.0)}), "k", "v", top_n=5
+        )
+        labels, values = _collapse_small_slices(
+            grouped[label_col].to_numpy(dtype=object), grouped[value_col].to_numpy(dtype=np.float64), 3
+        )
+        assert list(labels) == ["j", "i", "Other"]
+        assert values.sum() == 55.0
+
+    def test_collapse_noop_and_validation(self):
+        """Test that short inputs pass through and max_slices is validated"""
+        labels, values = _collapse_small_slices(np.array(["a", "b"]), np.array([1.0, 2.0]), 5)
+        assert list(labels) == ["a", "b"]
+        with pytest.raises(ValueError):
+            _collapse_small_slices(np.array(["a", "b"]), np.array([1.0, 2.0]), 1)
+
+    def test_positive_slices_filtering(self):
+        """Test vectorized removal of non-positive values for given and generic labels"""
+        labels, values = _positive_slices(pd.Series(["a", "b", "c", "d"]), pd.Series([3, 0, -1, 4]))
+        assert list(labels) == ["a", "d"]
+        assert list(values) == [3.0, 4.0]
+        labels, values = _positive_slices(None, pd.Series([0.0, 2.0, np.nan, 5.0]))
+        assert list(labels) == ["Category 2", "Category 4"]
+        assert list(values) == [2.0, 5.0]
+
+    async def test_pie_chart_max_slices(self, mcp_server):
+        """Test a pie chart with thousands of categories collapsed to a few wedges"""
+        data = {
+            "labels": [f"item {i}" for i in range(5000)],
+            "values": np.random.default_rng(0).integers(1, 1000, 5000).tolist(),
+        }
+        async with Client(mcp_server) as client:
+            result = await client.call_tool("create_pie_chart", {
+                "data": data, "labels_column": "labels", "values_column": "values", "max_slices": 8
+            })
+            validate_image_content(result)
+
+
+class TestAggregation:
+    @pytest.fixture
+    def transactions(self):
+        return pd.DataFrame({
+            "store": ["a", "b", "a", "c", "b", "a", "d"],
+            "amount": [10.0, 5.0, 20.0, 1.0, 5.0, 30.0, 2.0],
+        })
+
+    def test_group_sum(self, transactions):
+        """Test grouping raw rows and summing a value column"""
+        df, label_col, value_col = _aggregate_frame(transactions, "store", "amount", "sum")
+        assert (label_col, value_col) == ("store", "amount")
+        assert df.set_index("store")["amount"].to_dict() == {"a": 60.0, "b": 10.0, "c": 1.0, "d": 2.0}
+
+    def test_top_n_collapses_rest_into_other(self, transactions):
+        """Test that groups beyond top_n are aggregated from raw rows into an Other group"""
+        df, _, _ = _aggregate_frame(transactions, "store", "amount", "mean", top_n=1)
+        assert df["store"].tolist() == ["a", "Other"]
+        assert df["amount"].tolist() == [20.0, pytest.approx(13.0 / 4)]
+
+    def test_real_other_group_is_folded_into_bucket(self):
+        """Test that a group literally named Other does not produce a second Other row"""
+        rows = pd.DataFrame({"k": ["Other", "a", "b", "Other"], "v": [6.0, 5.0, 1.0, 4.0]})
+        df, _, _ = _aggregate_frame(rows, "k", "v", "sum", top_n=1)
+        assert df.values.tolist() == [["a", 5.0], ["Other", 11.0]]
+
+    def test_labels_are_strings_with_and_without_top_n(self):
+        """Test that group labels have the same dtype whether or not top_n applies"""
+        rows = pd.DataFrame({"k": [1, 2, 2, 3], "v": [1.0, 2.0, 3.0, 4.0]})
+        plain, _, _ = _aggregate_frame(rows, "k", "v")
+        top, _, _ = _aggregate_frame(rows, "k", "v", top_n=1)
+        assert plain["k"].tolist() == ["1", "2", "3"]
+        assert top["k"].tolist() == ["2", "Other"]
+
+    def test_count_without_value_column(self, transactions):
+        """Test counting rows per group"""
+        df, _, value_col = _aggregate_frame(transactions[["store"]], "store", None, "count")
+        assert value_col == "count"
+        assert df.set_index("store")["count"].to_dict() == {"a": 3, "b": 2, "c": 1, "d": 1}
+
+    def test_invalid_aggregation(self, transactions):
+        """Test validation of aggregation arguments"""
+        with pytest.raises(ValueError):
+            _aggregate_frame(transactions, "missing", "amount")
+        with pytest.raises(ValueError):
+            _aggregate_frame(transactions, "store", "amount", "mode")
+
+    async def test_aggregated_bar_and_pie_charts(self, mcp_server, transactions):
+        """Test aggregation through the bar and pie chart tools"""
+        records = transactions.to_dict(orient="records")
+        async with Client(mcp_server) as client:
+            result = await client.call_tool("create_bar_chart", {
+                "data": records, "group_by": "store", "y_column": "amount", "aggregate": "mean", "top_n": 2
+            })
+            validate_image_content(result)
+            result = await client.call_tool("create_pie_chart", {
+                "data": records, "group_by": "store", "aggregate": "count"
+            })
+            validate_image_content(result)
+
+
 class TestErrorHandling:
     async def test_bar_chart_invalid_data(self, mcp_server):
         """Test bar chart error handling with invalid data"""
@@ -300,6 +602,167 @@ class TestDataParsing:
             
             validate_image_content(result)
 
+    async def test_tsv_string_parsing(self, mcp_server):
+        """Test parsing of tab-separated string data"""
+        tsv_data = "month\tsales\nJan\t100\nFeb\t150\nMar\t120"
+        async with Client(mcp_server) as client:
+            result = await client.call_tool("create_bar_chart", {
+                "data": tsv_data,
+                "x_column": "month",
+                "y_column": "sales"
+            })
+            
+            validate_image_content(result)
+
+    async def test_ndjson_string_parsing(self, mcp_server):
+        """Test parsing of newline-delimited JSON records"""
+        ndjson_data = '{"x": 1, "y": 10}\n{"x": 2, "y": 20}\n{"x": 3, "y": 15}\n'
+        async with Client(mcp_server) as client:
+            result = await client.call_tool("create_line_chart", {
+                "data": ndjson_data,
+                "x_column": "x",
+                "y_column": "y"
+            })
+            
+            validate_image_content(result)
+
+    @pytest.mark.parametrize("text, expected", [
+        ('[{"a": 1}]', "json"),
+        ('  {"a": [1, 2]}', "json"),
+        ('{\n  "a": 1\n}', "json"),
+        ('{"a": 1}\n{"a": 2}', "ndjson"),
+        ("a,b\n1,2", "csv"),
+        ("a\tb\n1\t2", "tsv"),
+        ("/////7gAAAAQAAAA", "arrow"),
+        ("QVJST1cxAAD/////", "arrow"),
+        ("UEFSMRUEFQAV", "parquet"),
+        ("UEFSMQ,b\n1,2", "csv"),
+    ])
+    def test_format_sniffing(self, text, expected):
+        """Test that payload formats are detected without parsing"""
+        assert _sniff_format(text) == expected
+
+    def test_parse_errors_are_reported(self):
+        """Test that malformed payloads raise a descriptive ValueError"""
+        with pytest.raises(ValueError, match="JSON"):
+            _parse_data('[{"a": 1}')
+        with pytest.raises(ValueError, match="empty"):
+            _parse_data("   ")
+
+    def test_bracketed_csv_header_falls_back_to_csv(self):
+        """Test that a CSV header starting with a bracket is not mistaken for JSON"""
+        df = _parse_data("[a],b\n1,2\n3,4")
+        assert list(df.columns) == ["[a]", "b"]
+        assert df["b"].tolist() == [2, 4]
+
+    def test_uniform_records_build_typed_columns(self):
+        """Test that uniform JSON records become typed NumPy columns"""
+        df = _parse_data('[{"x": 1, "y": 1.5, "label": "a"}, {"x": 2, "y": 2.5, "label": "b"}]')
+        assert list(df.columns) == ["x", "y", "label"]
+        assert df["x"].dtype == "int64"
+        assert df["y"].dtype == "float64"
+        assert df["label"].tolist() == ["a", "b"]
+
+    def test_string_columns_skip_numpy_conversion(self):
+        """Test that one long label does not blow up into a fixed-width string array"""
+        import tracemalloc
+        records = [{"x": i, "label": "short"} for i in range(2000)]
+        records[0]["label"] = "x" * 10_000
+        tracemalloc.start()
+        df = _parse_data(records)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert df["label"].dtype == object
+        assert df["x"].dtype == np.int64
+        # A <U10000 array of 2000 rows alone would need 80 MB
+        assert peak < 10 * 1024 * 1024
+
+    def test_ragged_records_fall_back_to_pandas(self):
+        """Test that records with differing keys still parse"""
+        df = _parse_data([{"x": 1}, {"x": 2, "y": 3}])
+        assert list(df.columns) == ["x", "y"]
+        assert df["y"].isna().sum() == 1
+
+    def test_columnar_json_parsing(self):
+        """Test that column lists become typed columns"""
+        df = _parse_data('{"x": [1, 2, 3], "y": [0.5, 1.5, 2.5], "name": ["a", "b", "c"]}')
+        assert df["x"].dtype == "int64"
+        assert df["y"].dtype == "float64"
+        assert df["name"].tolist() == ["a", "b", "c"]
+
+    async def test_columnar_schema_input(self, mcp_server):
+        """Test the explicit columnar input schema across chart tools"""
+        payload = {
+            "columns": {"month": ["Jan", "Feb", "Mar"], "sales": [100, 150, 120]},
+            "dtypes": {"month": "category", "sales": "float32"}
+        }
+        async with Client(mcp_server) as client:
+            for tool in ("create_bar_chart", "create_line_chart", "create_pie_chart"):
+                result = await client.call_tool(tool, {"data": json.dumps(payload)})
+                validate_image_content(result)
+            result = await client.call_tool("create_histogram", {"data": payload, "column": "sales"})
+            validate_image_content(result)
+
+    def test_columnar_schema_dtypes(self):
+        """Test that declared dtypes are applied and bad schemas are rejected"""
+        df = _parse_data({"columns": {"a": [1, 2, 3], "b": [1, 0, 1]}, "dtypes": {"a": "float32", "b": "bool"}})
+        assert df["a"].dtype == "float32"
+        assert df["b"].dtype == "bool"
+
+        with pytest.raises(ValueError, match="same length"):
+            _parse_data({"columns": {"a": [1, 2], "b": [1]}})
+        with pytest.raises(ValueError, match="unknown columns"):
+            _parse_data({"columns": {"a": [1]}, "dtypes": {"z": "int64"}})
+        with pytest.raises(ValueError, match="could not be converted"):
+            _parse_data({"columns": {"a": ["x"]}, "dtypes": {"a": "int64"}})
+
+    def test_arrow_ipc_input(self):
+        """Test that a base64 Arrow IPC stream or file maps to pandas without copying numbers"""
+        pa = pytest.importorskip("pyarrow")
+        table = pa.table({
+            "x": pa.array(np.arange(1000, dtype=np.int64)),
+            "y": pa.array(np.linspace(0, 1, 1000)),
+            "label": pa.array(["a", "b"] * 500).dictionary_encode(),
+        })
+        for new_writer in (pa.ipc.new_stream, pa.ipc.new_file):
+            sink = pa.BufferOutputStream()
+            with new_writer(sink, table.schema) as writer:
+                writer.write_table(table)
+            encoded = base64.b64encode(sink.getvalue().to_pybytes()).decode()
+
+            df = _parse_data(encoded)
+            assert df["x"].dtype == np.int64
+            assert df["y"].dtype == np.float64
+            assert df["label"].dtype == "category"
+            assert df["x"].tolist() == list(range(1000))
+            # Zero-copy columns are read-only views of the Arrow buffers
+            assert not df["y"].to_numpy().flags.writeable
+
+    async def test_parquet_input(self, mcp_server):
+        """Test that a base64 Parquet file works across chart tools"""
+        pa = pytest.importorskip("pyarrow")
+        pq = pytest.importorskip("pyarrow.parquet")
+        sink = pa.BufferOutputStream()
+        pq.write_table(pa.table({"month": ["Jan", "Feb", "Mar"], "sales": [100.0, 150.0, 120.0]}), sink)
+        encoded = base64.b64encode(sink.getvalue().to_pybytes()).decode()
+
+        assert _sniff_format(encoded) == "parquet"
+        async with Client(mcp_server) as client:
+            for tool in ("create_bar_chart", "create_line_chart", "create_pie_chart"):
+                result = await client.call_tool(tool, {"data": encoded})
+                validate_image_content(result)
+            result = await client.call_tool("create_histogram", {"data": encoded, "column": "sales"})
+            validate_image_content(result)
+
+    def test_corrupt_binary_input(self):
+        """Test that undecodable Arrow/Parquet payloads raise a ValueError"""
+        pytest.importorskip("pyarrow")
+        with pytest.raises(ValueError, match="ARROW"):
+            _parse_data("/////wAAAAA=")
+        with pytest.raises(ValueError, match="PARQUET"):
+            _parse_data("UEFSMQ==")
+
     async def test_list_data_parsing(self, mcp_server):
         """Test parsing of list data"""
         list_data = [10, 20, 15, 25, 30]
@@ -313,6 +776,107 @@ class TestDataParsing:
             validate_image_content(result)
 
 
+class TestChunkedCsv:
+    @pytest.fixture
+    def small_chunks(self, monkeypatch):
+        """Treat every CSV payload as large and read it 1,000 rows at a time"""
+        monkeypatch.setattr(app_module, "_CSV_STREAM_BYTES", 0)
+        monkeypatch.setattr(app_module, "_CSV_CHUNK_ROWS", 1000)
+
+    @pytest.fixture
+    def sales(self):
+        rng = np.random.default_rng(0)
+        return pd.DataFrame({
+            "region": rng.choice(["north", "south", "east", "west", "Other"], size=5500),
+            "amount": rng.gamma(2.0, 50.0, size=5500).round(2),
+        })
+
+    @pytest.mark.parametrize("aggregate, top_n", [("sum", None), ("mean", 2), ("count", 3), ("max", 1)])
+    def test_chunked_aggregation_matches_full_parse(self, small_chunks, sales, aggregate, top_n):
+        """Test that per-chunk partials combine to the same groups as aggregating all rows"""
+        expected, _, value_col = _aggregate_frame(sales, "region", "amount", aggregate, top_n)
+        chunked, _, chunked_col = _aggregate_csv_chunks(sales.to_csv(index=False), "region", "amount", aggregate, top_n)
+
+        assert chunked_col == value_col
+        assert chunked["region"].tolist() == expected["region"].tolist()
+        assert np.allclose(chunked[value_col].to_numpy(dtype=float), expected[value_col].to_numpy(dtype=float))
+
+    def test_median_is_left_to_a_full_parse(self, small_chunks, sales):
+        """Test that aggregates without partials are not chunked"""
+        assert _aggregate_csv_chunks(sales.to_csv(index=False), "region", "amount", "median") is None
+
+    def test_chunked_histogram_matches_full_parse(self, small_chunks, sales):
+        """Test that two passes over the chunks give the same bins as a full parse"""
+        text = sales[["amount"]].to_csv(index=False)
+        _, expected, expected_edges = _histogram_counts(sales["amount"], bins=25)
+        labels, counts, edges = _histogram_csv_chunks(text, "amount", 25)
+
+        assert labels is None
+        assert np.allclose(edges, expected_edges)
+        assert counts.tolist() == expected.tolist()
+        # A category column next to the values is drawn as bars from a full parse instead
+        assert _histogram_csv_chunks(sales[["amount", "region"]].to_csv(index=False), "amount", 25) is None
+
+    def test_chunked_line_keeps_envelope(self, small_chunks):
+        """Test that the chunked line path bounds the points and keeps the extremes"""
+        y = np.sin(np.arange(20_000) / 100.0)
+        y[12_345] = 50.0
+        text = pd.DataFrame({"t": np.arange(20_000), "y": y}).to_csv(index=False)
+        reduced = _downsample_csv_chunks(text, "t", "y", max_points=100)
+
+        assert len(reduced) <= 20 * 2 * 100 + 40
+        assert reduced["y"].max() == 50.0
+        assert _downsample_csv_chunks("label,y\na,1\nb,2", None, None) is None
+
+    async def test_chunked_tools(self, mcp_server, small_chunks, sales):
+        """Test the chunked paths end to end through the chart tools"""
+        text = sales.to_csv(index=False)
+        async with Client(mcp_server) as client:
+            for tool, args in [
+                ("create_bar_chart", {"group_by": "region", "aggregate": "mean"}),
+                ("create_pie_chart", {"group_by": "region", "top_n": 2}),
+                ("create_histogram", {"column": "amount"}),
+                ("create_line_chart", {"data": pd.DataFrame({"v": np.arange(5000) % 97}).to_csv(index=False)}),
+            ]:
+                result = await client.call_tool(tool, {"data": text, **args})
+                validate_image_content(result)
+
+class TestFrameProfile:
+    @pytest.fixture
+    def frame(self):
+        return pd.DataFrame({
+            "value": [3.0, None, 1.0, 3.0],
+            "label": ["a", "b", None, "a"],
+            "step": [1, 2, 3, 4],
+        })
+
+    def test_column_statistics(self, frame):
+        """Test dtype, null count, cardinality and monotonicity of each column"""
+        profile = FrameProfile(frame)
+        value = profile.column("value")
+        assert value.numeric and value.null_count == 1 and value.cardinality == 2 and not value.monotonic
+        label = profile.column("label")
+        assert not label.numeric and label.null_count == 1 and label.cardinality == 2
+        assert profile.is_monotonic("step")
+        assert profile.numeric_columns(exclude=("step",)) == ["value"]
+
+    def test_statistics_computed_once(self, frame):
+        """Test that each statistic is computed once per profile"""
+        profile = FrameProfile(frame)
+        assert profile.cardinality("label") == 2
+        profile.df = None  # any recomputation would now fail
+        assert profile.cardinality("label") == 2
+
+    def test_label_value_columns(self, frame):
+        """Test role inference prefers categorical labels and honours explicit columns"""
+        profile = FrameProfile(frame)
+        assert profile.label_value_columns() == ("label", "value")
+        assert profile.label_value_columns("step", "value") == ("step", "value")
+        assert profile.label_value_columns("missing", "value") == ("label", "value")
+        assert FrameProfile(frame[["step", "value"]]).label_value_columns() == ("step", "value")
+        assert FrameProfile(frame[["value"]]).label_value_columns() is None
+
+
 class TestChartCustomization:
     async def test_chart_titles_and_labels(self, mcp_server, sample_data):
         """Test chart customization with titles and labels"""
@@ -341,5 +905,568 @@ class TestChartCustomization:
                 validate_image_content(result)
 
 
+class TestRenderExecutor:
+    async def test_event_loop_stays_responsive_during_render(self):
+        """Test that a blocking render does not block other coroutines"""
+        executor = RenderExecutor(mode="thread", max_workers=1)
+        release = threading.Event()
+        try:
+            render = asyncio.create_task(executor.run(release.wait, 5))
+            # The loop can still schedule other work while the render blocks its worker
+            await asyncio.sleep(0.05)
+            assert not render.done()
+            assert executor.pending == 1
+            release.set()
+            assert await render is True
+            assert executor.pending == 0
+        finally:
+            release.set()
+            executor.shutdown()
+
+    async def test_full_queue_rejects_new_renders(self):
+        """Test that renders beyond the max queue depth are rejected"""
+        executor = RenderExecutor(mode="thread", max_workers=1, max_queue=1)
+        release = threading.Event()
+        try:
+            render = asyncio.create_task(executor.run(release.wait, 5))
+            await asyncio.sleep(0.05)
+            with pytest.raises(ValueError, match="queue is full"):
+                await executor.run(release.wait, 5)
+            release.set()
+            await render
+        finally:
+            release.set()
+            executor.shutdown()
+
+    async def test_rejection_carries_retry_hint(self):
+        """Test that a rejected render says when to retry"""
+        executor = RenderExecutor(mode="thread", max_workers=1, max_queue=1)
+        release = threading.Event()
+        try:
+            render = asyncio.create_task(executor.run(release.wait, 5))
+            await asyncio.sleep(0.05)
+            with pytest.raises(RenderRejected, match="retry after") as rejected:
+                await executor.run(release.wait, 5)
+            assert rejected.value.retry_after > 0
+            assert executor.stats()["rejected"] == 1
+            release.set()
+            await render
+        finally:
+            release.set()
+            executor.shutdown()
+
+    async def test_per_kind_limits(self):
+        """Test that a chart type at its limit is rejected while others are still admitted"""
+        executor = RenderExecutor(mode="thread", max_workers=2, limits={"line": 1})
+        release = threading.Event()
+        try:
+            line = asyncio.create_task(executor.run(release.wait, 5, kind="line"))
+            await asyncio.sleep(0.05)
+            assert executor.stats()["pending_by_type"] == {"line": 1}
+            with pytest.raises(RenderRejected, match="Too many line charts"):
+                await executor.run(release.wait, 5, kind="line")
+            bar = asyncio.create_task(executor.run(release.wait, 5, kind="bar"))
+            release.set()
+            await asyncio.gather(line, bar)
+
+            assert await executor.run(time.time, kind="line")
+            assert executor.stats()["pending_by_type"] == {}
+        finally:
+            release.set()
+            executor.shutdown()
+
+    async def test_saturated_tool_fails_fast(self, mcp_server, monkeypatch, caplog, sample_data):
+        """Test that a tool call over its chart type's limit is shed with a retry hint"""
+        # FastMCP logs tool errors with rich tracebacks, which alone take longer than a render
+        caplog.set_level(logging.CRITICAL, logger="FastMCP")
+        monkeypatch.setattr(app_module, "_render_executor", RenderExecutor(mode="thread", limits={"pie": 1}))
+        render_spec = app_module._render_spec
+
+        def slow_render(spec):
+            time.sleep(0.5)
+            return render_spec(spec)
+
+        monkeypatch.setattr(app_module, "_render_spec", slow_render)
+        async with Client(mcp_server) as client:
+            slow = asyncio.create_task(client.call_tool("create_pie_chart", {"data": sample_data["pie_data"], "title": "Busy"}))
+            await asyncio.sleep(0.1)
+            started = time.monotonic()
+            with pytest.raises(Exception, match="retry after"):
+                await client.call_tool("create_pie_chart", {"data": sample_data["pie_data"], "title": "Shed"})
+            assert time.monotonic() - started < 0.4
+            validate_image_content(await slow)
+        app_module._render_executor.shutdown()
+
+    def test_parse_limits(self):
+        """Test the CHART_RENDER_LIMITS format"""
+        assert _parse_limits("line=4, histogram=8") == {"line": 4, "histogram": 8}
+        assert _parse_limits("") == {}
+        with pytest.raises(ValueError, match="Invalid render limit"):
+            _parse_limits("line")
+        with pytest.raises(ValueError):
+            RenderExecutor(limits={"line": 0})
+
+    async def test_small_render_is_not_stuck_behind_heavy_ones(self):
+        """Test that slow-lane renders leave the reserved worker to cheap ones"""
+        executor = RenderExecutor(mode="thread", max_workers=2, fast_workers=1, slow_cost=10)
+        release = threading.Event()
+        try:
+            heavy = [asyncio.create_task(executor.run(release.wait, 5, cost=1000)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            assert executor.stats()["queued"] == {"fast": 0, "slow": 2}
+
+            started = time.monotonic()
+            await asyncio.wait_for(executor.run(time.sleep, 0.01, cost=1), 2)
+            assert time.monotonic() - started < 1
+            assert not any(task.done() for task in heavy)
+            release.set()
+            await asyncio.gather(*heavy)
+        finally:
+            release.set()
+            executor.shutdown()
+
+    async def test_free_worker_takes_fast_lane_first(self):
+        """Test that queued cheap renders run before queued heavy ones"""
+        executor = RenderExecutor(mode="thread", max_workers=1, slow_cost=10)
+        release = threading.Event()
+        order = []
+        try:
+            blocker = asyncio.create_task(executor.run(release.wait, 5))
+            await asyncio.sleep(0.05)
+            heavy = asyncio.create_task(executor.run(order.append, "heavy", cost=1000))
+            light = asyncio.create_task(executor.run(order.append, "light", cost=1))
+            await asyncio.sleep(0.05)
+            release.set()
+            await asyncio.gather(blocker, heavy, light)
+        finally:
+            release.set()
+            executor.shutdown()
+
+        assert order == ["light", "heavy"]
+
+    async def test_cancelled_queued_render_frees_its_slot(self):
+        """Test that a caller giving up on a queued render releases it without running it"""
+        executor = RenderExecutor(mode="thread", max_workers=1)
+        release = threading.Event()
+        ran = []
+        try:
+            blocker = asyncio.create_task(executor.run(release.wait, 5))
+            queued = asyncio.create_task(executor.run(ran.append, 1))
+            await asyncio.sleep(0.05)
+            assert executor.pending == 2
+            queued.cancel()
+            await asyncio.sleep(0.05)
+            assert executor.pending == 1
+            release.set()
+            await blocker
+        finally:
+            release.set()
+            executor.shutdown()
+
+        assert ran == []
+
+    def test_estimate_cost(self):
+        """Test that render costs scale with the input size and chart type"""
+        records = [{"x": i, "y": i} for i in range(1000)]
+        frame = pd.DataFrame(records)
+
+        assert _estimate_cost("line", {"data": records}) == 2000
+        assert _estimate_cost("line", {"data": frame}) == 2000
+        assert _estimate_cost("bar", {"data": frame}) > _estimate_cost("histogram", {"data": frame})
+        assert _estimate_cost("bar", {"data": frame, "group_by": "x"}) < _estimate_cost("bar", {"data": frame})
+        assert _estimate_cost("line", {"data": frame.to_csv(index=False)}) > 0
+        assert _estimate_cost("histogram", {"data": None, "counts": [1, 2, 3]}) < 1
+        assert _estimate_cost("pie", {"data": {"A": 1, "B": 2}}) < 1
+
+    async def test_process_pool_render(self, sample_data):
+        """Test rendering a chart on the process pool backend"""
+        executor = RenderExecutor(mode="process", max_workers=1)
+        try:
+            result = await executor.run(
+                _render_spec, ChartSpec("bar", {"data": sample_data["simple_dict"], "x_column": None,
+                                                "y_column": None, "title": "Bar Chart", "x_label": "Categories",
+                                                "y_label": "Values", "color": "steelblue", "horizontal": False})
+            )
+            validate_image_content([result])
+        finally:
+            executor.shutdown()
+
+    async def test_process_workers_are_recycled(self):
+        """Test that process workers are replaced after the configured number of renders"""
+        executor = RenderExecutor(mode="process", max_workers=1, recycle_after=1)
+        try:
+            first_pid = await executor.run(os.getpid)
+            second_pid = await executor.run(os.getpid)
+            assert first_pid != second_pid
+        finally:
+            executor.shutdown()
+
+    async def test_concurrent_thread_renders_match_serial_render(self, sample_data):
+        """Test that charts drawn concurrently in threads are identical to a lone render"""
+        import matplotlib.pyplot as plt
+
+        spec = ChartSpec("bar", {"data": sample_data["list_of_dicts"], "x_column": None, "y_column": None,
+                                 "title": "Concurrent", "x_label": "Categories", "y_label": "Values",
+                                 "color": "green", "horizontal": False})
+        executor = RenderExecutor(mode="thread", max_workers=4)
+        try:
+            expected = (await executor.run(_render_spec, spec)).data
+            results = await asyncio.gather(*[executor.run(_render_spec, spec) for _ in range(8)])
+        finally:
+            executor.shutdown()
+
+        assert all(result.data == expected for result in results)
+        # Rendering never touches pyplot's global figure manager
+        assert plt.get_fignums() == []
+
+    def test_invalid_mode(self):
+        """Test that unknown executor modes are rejected"""
+        with pytest.raises(ValueError):
+            RenderExecutor(mode="fiber")
+
+
+class TestEncoding:
+    def test_encode_png_buffer_matches_base64(self):
+        """Test that encoding from the buffer view matches a plain base64 round-trip"""
+        payload = bytes(range(256)) * 100
+        buffer = io.BytesIO(payload)
+
+        assert _encode_png_buffer(buffer) == base64.b64encode(payload).decode("utf-8")
+        assert buffer.closed
+
+
+class TestRenderCache:
+    async def test_repeat_call_is_served_from_cache(self, mcp_server, sample_data):
+        """Test that an identical chart request is answered from the render cache"""
+        args = {"data": sample_data["pie_data"], "title": "Cached Pie", "colors": ["red", "blue", "green", "gold"]}
+        async with Client(mcp_server) as client:
+            first = await client.call_tool("create_pie_chart", args)
+            before = json.loads((await client.call_tool("get_render_stats", {}))[0].text)["cache"]
+            # Reordered keys and explicit defaults still hash to the same entry
+            second = await client.call_tool("create_pie_chart", {"startangle": 90, **dict(reversed(list(args.items())))})
+            after = json.loads((await client.call_tool("get_render_stats", {}))[0].text)["cache"]
+
+        assert first[0].data == second[0].data
+        assert after["hits"] == before["hits"] + 1
+        assert after["misses"] == before["misses"]
+
+    def test_lru_eviction_by_entries(self):
+        """Test that the least recently used chart is evicted first"""
+        cache = RenderCache(max_entries=2)
+        for key in ("a", "b"):
+            cache.put(key, key * 10)
+        cache.get("a")
+        cache.put("c", "c" * 10)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_eviction_by_bytes(self):
+        """Test that the cache stays within its byte budget"""
+        cache = RenderCache(max_entries=10, max_bytes=25)
+        for key in ("a", "b", "c"):
+            cache.put(key, key * 10)
+
+        stats = cache.stats()
+        assert stats["entries"] == 2
+        assert stats["bytes"] == 20
+        assert cache.get("a") is None
+
+
+class TestSingleFlight:
+    async def test_concurrent_identical_calls_share_one_render(self, mcp_server, monkeypatch):
+        """Test that simultaneous identical tool calls render the chart once"""
+        monkeypatch.setattr(app_module, "_render_cache", RenderCache(max_entries=0))
+        monkeypatch.setattr(app_module, "_single_flight", SingleFlight())
+        rendered = []
+        render_spec = app_module._render_spec
+
+        def slow_render(spec):
+            rendered.append(spec.chart_type)
+            time.sleep(0.3)
+            return render_spec(spec)
+
+        monkeypatch.setattr(app_module, "_render_spec", slow_render)
+        args = {"data": {"x": [1, 2, 3, 4], "y": [3, 1, 4, 1]}, "x_column": "x", "y_column": "y", "title": "Fan-out"}
+        async with Client(mcp_server) as client:
+            results = await asyncio.gather(*(client.call_tool("create_line_chart", args) for _ in range(5)))
+            stats = json.loads((await client.call_tool("get_render_stats", {}))[0].text)["coalescing"]
+
+        assert rendered == ["line"]
+        assert len({result[0].data for result in results}) == 1
+        assert stats == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+
+    async def test_cancelled_caller_does_not_cancel_the_render(self):
+        """Test that the shared render survives one of its callers going away"""
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "png"
+
+        first = asyncio.ensure_future(flight.run("k", work))
+        second = asyncio.ensure_future(flight.run("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+
+        assert await second == "png"
+        assert first.cancelled()
+        assert flight.stats()["in_flight"] == 0
+
+    async def test_errors_are_shared_but_not_remembered(self):
+        """Test that a failed render fails every waiter and the next call retries"""
+        flight = SingleFlight()
+        attempts = []
+
+        async def failing():
+            attempts.append(1)
+            await asyncio.sleep(0.05)
+            raise ValueError("bad chart")
+
+        results = await asyncio.gather(flight.run("k", failing), flight.run("k", failing), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        with pytest.raises(ValueError):
+            await flight.run("k", failing)
+        assert len(attempts) == 2
+
+
+class TestDiskRenderCache:
+    def test_entries_are_shared_between_instances(self, tmp_path):
+        """Test that separate cache instances (one per worker process) share stored charts"""
+        path = str(tmp_path / "cache" / "charts.db")
+        writer = DiskRenderCache(path)
+        reader = DiskRenderCache(path)
+        writer.put("key", "cG5nLWJ5dGVz")
+
+        assert reader.get("key") == "cG5nLWJ5dGVz"
+        assert reader.stats()["hits"] == 1
+
+    def test_expired_entries_are_ignored(self, tmp_path):
+        """Test that charts older than the TTL are treated as misses"""
+        cache = DiskRenderCache(str(tmp_path / "charts.db"), ttl_seconds=0.01)
+        cache.put("key", "cG5nLWJ5dGVz")
+        time.sleep(0.05)
+
+        assert cache.get("key") is None
+
+    def test_database_errors_degrade_to_misses(self, tmp_path):
+        """Test that a broken disk tier never fails the render it sits behind"""
+        import sqlite3
+        path = str(tmp_path / "charts.db")
+        cache = DiskRenderCache(path)
+        with sqlite3.connect(path) as conn:
+            conn.execute("DROP TABLE encoded_charts")
+
+        cache.put("key", "cG5nLWJ5dGVz")
+        assert cache.get("key") is None
+        stats = cache.stats()
+        assert stats["errors"] == 2 and stats["misses"] == 1 and stats["entries"] is None
+
+    def test_max_bytes_evicts_least_recently_used(self, tmp_path):
+        """Test that the disk tier stays within its byte budget"""
+        cache = DiskRenderCache(str(tmp_path / "charts.db"), max_bytes=250)
+        cache.put("a", "a" * 100)
+        cache.put("b", "b" * 100)
+        cache.get("a")
+        cache.put("c", "c" * 100)
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.stats()["bytes"] == 200
+
+
+
+class TestDatasetRegistry:
+    async def test_upload_once_chart_many_times(self, mcp_server, sample_data):
+        """Test that every chart tool accepts a handle from upload_dataset"""
+        async with Client(mcp_server) as client:
+            upload = json.loads((await client.call_tool("upload_dataset", {"data": sample_data["list_of_dicts"]}))[0].text)
+            again = json.loads((await client.call_tool("upload_dataset", {"data": sample_data["list_of_dicts"]}))[0].text)
+            assert upload["dataset"] == again["dataset"]
+            assert upload["rows"] == 4 and upload["columns"] == ["category", "value"]
+
+            for tool in ("create_bar_chart", "create_line_chart", "create_pie_chart"):
+                result = await client.call_tool(tool, {"dataset": upload["dataset"], "title": f"{tool} from handle"})
+                validate_image_content(result)
+            result = await client.call_tool("create_histogram", {"dataset": upload["dataset"], "column": "value"})
+            validate_image_content(result)
+
+            stats = json.loads((await client.call_tool("get_render_stats", {}))[0].text)["datasets"]
+            assert stats["entries"] >= 1
+
+    async def test_unknown_handle_and_conflicting_inputs(self, mcp_server, sample_data):
+        """Test that unknown handles and data plus dataset are rejected"""
+        async with Client(mcp_server) as client:
+            with pytest.raises(Exception):
+                await client.call_tool("create_bar_chart", {"dataset": "ds_missing"})
+            with pytest.raises(Exception):
+                await client.call_tool("create_bar_chart", {"dataset": "ds_missing", "data": sample_data["bar_data"]})
+
+    def test_lru_eviction_by_bytes(self):
+        """Test that the least recently used dataset is evicted to respect max_bytes"""
+        frame = pd.DataFrame({"x": np.arange(1000, dtype=np.int64)})
+        size = int(frame.memory_usage(index=True, deep=True).sum())
+        registry = DatasetRegistry(max_bytes=int(size * 2.5))
+        registry.put("a", frame)
+        registry.put("b", frame.copy())
+        registry.get("a")
+        registry.put("c", frame.copy())
+
+        assert registry.get("a") is frame
+        with pytest.raises(ValueError):
+            registry.get("b")
+        assert registry.stats()["evictions"] == 1
+        with pytest.raises(ValueError):
+            DatasetRegistry(max_bytes=size - 1).put("big", frame)
+
+    def test_idle_datasets_expire(self):
+        """Test that datasets unused for longer than the TTL are dropped"""
+        registry = DatasetRegistry(ttl_seconds=0.05)
+        registry.put("a", pd.DataFrame({"x": [1, 2, 3]}))
+        time.sleep(0.1)
+
+        with pytest.raises(ValueError):
+            registry.get("a")
+        assert registry.stats()["expirations"] == 1
+
+
+    def test_shared_directory(self, tmp_path):
+        """Test that a dataset stored by one process's registry is found by another's"""
+        frame = pd.DataFrame({"x": np.arange(10), "label": list("abcdefghij")})
+        handle = "ds_" + "0" * 32
+        writer = DatasetRegistry(path=str(tmp_path))
+        reader = DatasetRegistry(path=str(tmp_path))
+        writer.put(handle, frame)
+
+        pd.testing.assert_frame_equal(reader.get(handle), frame)
+        assert reader.stats()["shared_hits"] == 1
+        reader.get(handle)
+        assert reader.stats()["shared_hits"] == 1
+        # Client-supplied handles never name arbitrary files
+        assert reader.lookup("../" + handle) is None
+
+    def test_shared_files_expire(self, tmp_path):
+        """Test that shared files idle past the TTL are ignored and pruned"""
+        handle = "ds_" + "1" * 32
+        registry = DatasetRegistry(ttl_seconds=0.05, path=str(tmp_path))
+        registry.put(handle, pd.DataFrame({"x": [1, 2, 3]}))
+        time.sleep(0.1)
+
+        assert DatasetRegistry(ttl_seconds=0.05, path=str(tmp_path)).lookup(handle) is None
+        registry.put("ds_" + "2" * 32, pd.DataFrame({"x": [4]}))
+        assert sorted(os.listdir(tmp_path)) == ["ds_" + "2" * 32 + ".pkl"]
+
+
+class TestResources:
+    async def test_chart_resource_link(self, mcp_server, sample_data):
+        """Test that as_resource returns a chart:// link whose resource holds the PNG"""
+        args = {"data": sample_data["list_of_dicts"], "title": "Linked Chart"}
+        async with Client(mcp_server) as client:
+            inline = await client.call_tool("create_bar_chart", args)
+            link = json.loads((await client.call_tool("create_bar_chart", {**args, "as_resource": True}))[0].text)
+            assert link["uri"].startswith("chart://") and link["mimeType"] == "image/png"
+
+            contents = await client.read_resource(link["uri"])
+            png = base64.b64decode(contents[0].blob)
+
+        assert png == base64.b64decode(inline[0].data)
+        assert Image.open(io.BytesIO(png)).format == "PNG"
+
+    async def test_unknown_chart_resource(self, mcp_server):
+        """Test that reading an evicted or unknown chart fails"""
+        async with Client(mcp_server) as client:
+            with pytest.raises(Exception):
+                await client.read_resource("chart://" + "0" * 64)
+
+    async def test_dataset_resource(self, mcp_server, sample_data):
+        """Test that uploaded datasets are readable as CSV resources"""
+        async with Client(mcp_server) as client:
+            upload = json.loads((await client.call_tool("upload_dataset", {"data": sample_data["csv_string"]}))[0].text)
+            contents = await client.read_resource(upload["uri"])
+
+        assert upload["uri"] == f"dataset://{upload['dataset']}"
+        assert pd.read_csv(io.StringIO(contents[0].text))["value"].tolist() == [10, 20, 15, 25]
+
+class TestAsgiApp:
+    def test_create_app(self, monkeypatch):
+        """Test that the gunicorn factory builds a stateless streamable-HTTP app"""
+        monkeypatch.setattr(app_module.mcp.settings, "stateless_http", False)
+        app = app_module.create_app()
+
+        assert app.state.path == "/mcp"
+        assert app_module.mcp.settings.stateless_http
+
+    def test_gunicorn_config(self, monkeypatch):
+        """Test that the gunicorn config runs one uvicorn worker per requested core"""
+        import runpy
+        monkeypatch.setenv("CHART_WEB_WORKERS", "3")
+        config = runpy.run_path(os.path.join(os.path.dirname(app_module.__file__), "gunicorn.conf.py"))
+
+        assert config["workers"] == 3
+        assert config["worker_class"] == "uvicorn.workers.UvicornWorker"
+        assert not config["preload_app"]
+
+class TestStatelessHttp:
+    class RoundRobin(httpx.AsyncBaseTransport):
+        """Load balancer that sends each HTTP request to the next server instance in turn."""
+
+        def __init__(self, apps):
+            self.transports = [httpx.ASGITransport(app=app) for app in apps]
+            self.served = [0] * len(apps)
+            self._next = 0
+
+        async def handle_async_request(self, request):
+            index, self._next = self._next, (self._next + 1) % len(self.transports)
+            self.served[index] += 1
+            return await self.transports[index].handle_async_request(request)
+
+    @pytest.fixture
+    def balanced_client(self, monkeypatch):
+        """Return a factory for one client spread over two in-process server instances"""
+        from fastmcp.client.transports import StreamableHttpTransport
+        from sse_starlette.sse import AppStatus
+        # sse_starlette keeps a process-wide exit event bound to the first loop that used it
+        monkeypatch.setattr(AppStatus, "should_exit_event", None)
+
+        async def connect(stack: AsyncExitStack, stateless: bool):
+            monkeypatch.setattr(app_module.mcp.settings, "stateless_http", stateless)
+            # Each app has its own session manager, as a separate process would
+            apps = [app_module.mcp.http_app() for _ in range(2)]
+            for app in apps:
+                await stack.enter_async_context(app.router.lifespan_context(app))
+            balancer = self.RoundRobin(apps)
+
+            def client_factory(headers=None, timeout=None, auth=None):
+                return httpx.AsyncClient(transport=balancer, headers=headers, timeout=timeout, auth=auth)
+
+            transport = StreamableHttpTransport("http://charts.test/mcp/", httpx_client_factory=client_factory)
+            return Client(transport), balancer
+
+        return connect
+
+    async def test_any_instance_answers(self, balanced_client, sample_data):
+        """Test that alternate requests of one client succeed on two stateless instances"""
+        async with AsyncExitStack() as stack:
+            client, balancer = await balanced_client(stack, stateless=True)
+            async with client:
+                tools = await client.list_tools()
+                for value in (10, 20, 30):
+                    data = {**sample_data["simple_dict"], "E": value}
+                    validate_image_content(await client.call_tool("create_bar_chart", {"data": data}))
+
+        assert "create_bar_chart" in {tool.name for tool in tools}
+        assert min(balancer.served) >= 3
+
+    async def test_sessions_are_bound_to_one_instance(self, balanced_client, sample_data):
+        """Test that the default stateful mode cannot be spread over instances"""
+        async with AsyncExitStack() as stack:
+            client, _ = await balanced_client(stack, stateless=False)
+            with pytest.raises(Exception):
+                async with client:
+                    await asyncio.wait_for(client.call_tool("create_bar_chart", {"data": sample_data["simple_dict"]}), 30)
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])